@@ -1,23 +1,112 @@
+import argparse
 import os
 import re
 import shutil
 import subprocess
 import json
+import hashlib
+import socket
 import sys
+import tempfile
+import time
+import threading
+import queue
+import http.client
+import urllib.error
+import urllib.parse
+import urllib.request
 import pytubefix.extract
+import pytubefix.request
 from pytubefix import YouTube, Channel, Playlist
 from pytubefix.cli import on_progress
 from pathlib import Path
-from datetime import datetime
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta
+try:
+    import fcntl  # shares the bandwidth limit with other YTDL instances (not available on Windows)
+except ImportError:
+    fcntl = None
+try:
+    import httpx  # optional, HTTP/2 for the shared session pool (pip install "httpx[http2]")
+except ImportError:
+    httpx = None
 
 version = "1.3.9 (20250329)"
 header_width_global = 99
 first_column_width = 17
 first_column_width_wide = 37
 channel_config_path = "/" + "_config_channel.json"
+archive_index_path = "/" + "_archive_index.json"
+metadata_cache_path = "/" + "_metadata_cache.json"
+sync_state_path = "/" + "_sync_state.json"
+playlist_state_path = "/" + "_playlist_state.json"
+rejection_cache_path = "/" + "_rejection_cache.json"
 date_format_display = "%d.%m.%Y"
 date_time_format = "%d.%m.%Y %H:%M:%S"
 date_format_math = "%Y-%m-%d"
+metadata_cache_lock = threading.Lock()
+temp_directory = "tmp"
+streams_complete_file = "streams_complete.json"
+job_directory_max_age_days = 7
+video_sessions = {}  # video id -> VideoSession, from the metadata fetch to the download
+video_sessions_lock = threading.Lock()
+video_session_expiry_margin = 600  # seconds, stream URLs closer to their expiry are resolved again
+playlist_prefetch_pages = 2  # playlist listing pages requested ahead of the one being read
+downloads_cancelled = threading.Event()
+headless = False
+bandwidth_state_path = os.path.join(tempfile.gettempdir(), "ytdl_bandwidth.json")
+bandwidth_lock = threading.Lock()
+bandwidth_memory_state = {}
+bandwidth_local = {"rate": 0.0, "credit": 0.0}  # bytes taken from the shared bucket, not yet transferred
+bandwidth_batch_seconds = 1.0  # transfer time taken from the shared bucket at once, one state file update each
+postprocess_queue_file = "postprocess_queue.json"  # in temp_directory, queued ffmpeg jobs survive a restart
+postprocess_condition = threading.Condition()
+postprocess_jobs = []    # queued post processing jobs (see postprocess_job), oldest first
+postprocess_active = []  # jobs a worker is running
+postprocess_workers = {"encode": 0, "copy": 0}  # worker threads per pool, see postprocess_pool
+postprocess_copy_workers = 1  # stream copy stages (merge, remux) run outside the transcode CPU budget
+postprocess_failures = 0
+postprocess_failed_videos = set()  # video ids whose post processing failed in this run
+unusable_stream_videos = set()  # video ids skipped in this run, their manifest had no stream to download
+postprocess_max_attempts = 3  # a job failing this often is dropped from the queue file
+# Post processing stages that encode, they share the transcode CPU budget and wait for the transcode_window
+TRANSCODE_STAGES = ("transcode", "audio_encode")
+archive_index = None
+archive_index_lock = threading.Lock()
+HTTP_DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0", "accept-language": "en-US,en"}
+HTTP_REDIRECT_CODES = (301, 302, 303, 307, 308)
+# unit of a relative listing date ("3 weeks ago") -> (shortest, longest) length in days
+LISTING_AGE_UNITS = {"second": (1 / 86400, 1 / 86400), "minute": (1 / 1440, 1 / 1440), "hour": (1 / 24, 1 / 24),
+                     "day": (1, 1), "week": (7, 7), "month": (28, 31), "year": (365, 366)}
+http_pool_enabled = False
+http_pool_lock = threading.Lock()
+http_pool_idle = {}   # (scheme, host, port) -> idle keep-alive connections
+http_pool_slots = {}  # (scheme, host, port) -> semaphore limiting the connections per host
+http_pool_stats = {}  # host -> {"opened", "reused", "requests", "bytes"}
+http_pool_max_per_host = 6
+http_pool_client = None  # httpx.Client when http2 is enabled
+active_job_directories = set()
+metrics_lock = threading.Lock()
+metrics_run = datetime.now().strftime("%Y%m%d_%H%M%S") + f"_{os.getpid()}"
+metrics_channel = ""
+metrics_file = None
+metrics_prometheus_file = ""  # from config.json, empty until the config was read
+metrics_series = None  # Prometheus series -> value, continued from the existing textfile
+metrics_written = 0.0
+METRICS_BUCKETS = [0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900]
+ARCHIVE_FILE_NAME_PATTERN = re.compile(r"^(?P<publish_date>\d{4}-\d{2}-\d{2}) - (?:(?P<resolution>\d{3,4}p) - )?"
+                                       r"(?P<title>.*) - (?P<video_id>[A-Za-z0-9_-]{11})\.(?P<container>mp4|mkv|mp3|m4a|opus)$")
+# remux: copy streams into mp4, mkv: copy streams into mkv, transcode: H.264/AAC re-encoding (>1080p)
+OUTPUT_POLICIES = ["remux", "mkv", "transcode"]
+# output policy -> stream codecs that are copied without re-encoding (None = any)
+OUTPUT_VIDEO_CODECS = {"remux": ("avc1", "av01", "vp9"), "mkv": None, "transcode": ("avc1",)}
+OUTPUT_AUDIO_CODECS = {"remux": ("aac",), "mkv": None, "transcode": ("aac",)}
+# audio only: audio_format -> stream codecs stored as they are (None = always encoded), the format is the extension
+AUDIO_FORMAT_CODECS = {"m4a": ("aac",), "opus": ("opus",), "mp3": None}
+AUDIO_FORMAT_ENCODERS = {"m4a": ["-c:a", "aac", "-b:a", "192k"], "opus": ["-c:a", "libopus", "-b:a", "160k"],
+                         "mp3": ["-c:a", "libmp3lame", "-q:a", "2"]}
 
 class BCOLORS:
     WHITE      = "\033[97m"
@@ -33,6 +122,7 @@ class BCOLORS:
     DARK_YELLOW= "\033[33m"
     DARK_GREEN = "\033[32m"
     DARK_RED   = "\033[31m"
+    ORANGE     = "\033[38;5;208m"
     UNDERLINE  = "\033[4m"
     BOLD       = "\033[1m"
     MOVES1UP   = "\033[F"
@@ -46,7 +136,38 @@ REQUIRED_APP_CONFIG = {
     "show_latest_video_date": "",
     "filters_on_in_channels_list": "",
     "default_audioMP3": "",
-    "web_client": ""
+    "web_client": "",
+    "metadata_cache_ttl_hours": {
+        "title": 720,
+        "length": 720,
+        "publish_date": 8760,
+        "age_restricted": 168,
+        "playability_status": 24,
+        "views": 24
+    },
+    "metadata_workers": 4,
+    "postprocess_queue_size": 2,
+    "channel_scan_workers": 8,
+    "output_policy": "remux",
+    "download_connections": 4,
+    "download_chunk_size_mb": 8,
+    "streaming_merge": False,
+    "bandwidth_limit_mbit": 0,
+    "bandwidth_schedule": [],
+    "http_connections_per_host": 6,
+    "http2": False,
+    "metrics_directory": "",
+    "metrics_prometheus_file": "",
+    "incremental_sync": True,
+    "full_rescan_days": 7,
+    "stream_codecs": [],
+    "avoid_transcode": False,
+    "audio_format": "m4a",
+    "transcode_cpu_budget": 0,
+    "transcode_threads": 0,
+    "transcode_nice": 10,
+    "transcode_ionice": True,
+    "transcode_window": {}
 }
 
 REQUIRED_VIDEO_CHANNEL_CONFIG = {
@@ -61,7 +182,9 @@ REQUIRED_VIDEO_CHANNEL_CONFIG = {
     "c_year_subfolders": "",
     "c_exclude_video_ids": "",
     "c_include_video_ids": "",
-    "c_filter_words": ""
+    "c_filter_words": "",
+    "c_output_policy": "",
+    "c_audio_format": ""
 }
 
 
@@ -74,7 +197,8 @@ def channel_config_control() -> None:
                 default_maximum_year != max_year or default_only_restricted != only_restricted_videos or
                 default_skip_restricted != skip_restricted or default_minimum_views != min_video_views or
                 default_year_subfolders != year_subfolders_temp or default_exclude_videos != exclude_video_ids or
-                default_include_videos != include_video_ids or default_filter_words != video_name_filter):
+                default_include_videos != include_video_ids or default_filter_words != video_name_filter or
+                default_output_policy != output_policy or default_audio_format != audio_format):
             update_settings_text = print_colored_text("\nUpdate settings in channel config file?  Y/n", BCOLORS.BLUE)
             save_settings_in_channel_config = smart_input(update_settings_text, "n")
             if save_settings_in_channel_config == "y":
@@ -105,13 +229,18 @@ def channel_config_control() -> None:
                     update_json_config(ytchannel_path + channel_config_path, "c_include_video_ids", include_video_ids)
                 if default_filter_words != video_name_filter:
                     update_json_config(ytchannel_path + channel_config_path, "c_filter_words", video_name_filter)
+                if default_output_policy != output_policy:
+                    update_json_config(ytchannel_path + channel_config_path, "c_output_policy", output_policy)
+                if default_audio_format != audio_format:
+                    update_json_config(ytchannel_path + channel_config_path, "c_audio_format", audio_format)
     else:
         if (default_max_res != limit_resolution_to or default_min_duration_in_minutes != min_duration or
                 default_max_duration_in_minutes != max_duration or default_minimum_year != min_year or
                 default_maximum_year != max_year or default_only_restricted != only_restricted_videos or
                 default_skip_restricted != skip_restricted or default_minimum_views != min_video_views or
                 default_year_subfolders != year_subfolders_temp or default_exclude_videos != exclude_video_ids or
-                default_include_videos != include_video_ids or default_filter_words != video_name_filter):
+                default_include_videos != include_video_ids or default_filter_words != video_name_filter or
+                default_output_policy != output_policy or default_audio_format != audio_format):
             create_text = print_colored_text("Create channel config file?  Y/n", BCOLORS.BLUE)
             create_channel_config_file = smart_input(create_text, "n")
             if create_channel_config_file == "y":
@@ -151,6 +280,12 @@ def channel_config_control() -> None:
                 json_video_name_filter = ""
                 if default_filter_words != video_name_filter:
                     json_video_name_filter = video_name_filter
+                json_output_policy = ""
+                if default_output_policy != output_policy:
+                    json_output_policy = output_policy
+                json_audio_format = ""
+                if default_audio_format != audio_format:
+                    json_audio_format = audio_format
                 custom_values = {
                     "c_max_resolution": json_max_res,
                     "c_min_duration_in_minutes": json_min_duration_in_minutes,
@@ -163,7 +298,9 @@ def channel_config_control() -> None:
                     "c_year_subfolders": json_year_subfolders_temp,
                     "c_exclude_video_ids": json_exclude_video_ids,
                     "c_include_video_ids": json_include_video_ids,
-                    "c_filter_words": json_video_name_filter
+                    "c_filter_words": json_video_name_filter,
+                    "c_output_policy": json_output_policy,
+                    "c_audio_format": json_audio_format
                 }
                 create_json_config(ytchannel_path + channel_config_path, custom_values)
 
@@ -283,7 +420,7 @@ def contains_folder_starting_with_2(path: str) -> bool:
 def make_year_subfolder_structure(path: str) -> None:
     if os.path.exists(path):
         if (not contains_folder_starting_with_2(path) and
-                any(file.endswith((".mp4", ".mp3")) for file in os.listdir(path)
+                any(file.endswith((".mp4", ".mkv", ".mp3", ".m4a", ".opus")) for file in os.listdir(path)
                     if os.path.isfile(os.path.join(path, file)))):
             organize_files_by_year(path)
 
@@ -338,8 +475,8 @@ def cc_save_config(cc_file_path: str, cc_config: str) -> None:
     with open(cc_file_path, "w", encoding="utf-8") as cc_file:
         json.dump(cc_config, cc_file, indent=4, ensure_ascii=False)
 
-def cc_check_and_update_json_config(cc_file_path: str, cc_required_config: dict) -> None:
-    """Ensures all required keys exist in the config file, adding missing ones."""
+def cc_check_and_update_json_config(cc_file_path: str, cc_required_config: dict) -> bool:
+    """Ensures all required keys exist in the config file, adding missing ones. Returns whether keys were added."""
     cc_config = cc_load_config(cc_file_path)  # Load existing or empty config
 
     # Check for missing keys and add them
@@ -351,9 +488,13 @@ def cc_check_and_update_json_config(cc_file_path: str, cc_required_config: dict)
 
     if missing_keys:
         cc_save_config(cc_file_path, cc_config)  # Save only if changes were made
+    return bool(missing_keys)
 
 
 def smart_input(prompt: str, default_value: str):
+    # Non-interactive runs (--sync/--input-file) take every default, i.e. the channel config values
+    if headless:
+        return default_value
     user_input = input(f"{prompt} [{default_value}]: ").strip()
     return user_input if user_input else default_value
 
@@ -436,7 +577,7 @@ def format_header(counter: str, width: int) -> str:
     return formatted
 
 
-def print_video_infos(yt: YouTube, res: str, video_views: int) -> None:
+def print_video_infos(yt: YouTube, res: str, video_views: int, resolutions: list[str]) -> None:
     print(print_colored_text("Title:" + " " * (first_column_width - len("Title:")), BCOLORS.BLACK),
           print_colored_text(print_colored_text(yt.title, BCOLORS.WHITE), BCOLORS.BOLD))
 
@@ -475,7 +616,7 @@ def print_video_infos(yt: YouTube, res: str, video_views: int) -> None:
         print(print_colored_text("Resolution:" + " " * (first_column_width - len("Resolution:")), BCOLORS.BLACK),
               print_colored_text(res, BCOLORS.YELLOW),
               print_colored_text("  (" + limit_resolution_to + ")", BCOLORS.BLACK))
-        print(" " * first_column_width, print_colored_text(str(print_resolutions(yt)), BCOLORS.BLACK))
+        print(" " * first_column_width, print_colored_text(str(resolutions), BCOLORS.BLACK))
 
 
 def format_time(seconds: int) -> str:
@@ -504,9 +645,8 @@ def format_view_count(number: int) -> str:
         return str(number)
 
 
-def rename_files_in_temp_directory() -> None:
+def rename_files_in_temp_directory(directory: str) -> None:
     """Removes ':' from filenames in a given directory."""
-    directory = os.getcwd()
     if not os.path.exists(directory):
         print("Error: Directory does not exist!")
         return
@@ -519,6 +659,56 @@ def rename_files_in_temp_directory() -> None:
             os.rename(old_path, new_path)
 
 
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="YTDL - YouTube Channel Downloader")
+    parser.add_argument("--sync", nargs="*", metavar="CHANNEL",
+                        help="non-interactive sync of all channels in channels.txt, or only of the given channel "
+                             "URLs/names, using the filters of each channel config")
+    parser.add_argument("--input-file", metavar="FILE",
+                        help="non-interactive download of the video URLs, playlist URLs and video IDs in FILE")
+    parser.add_argument("--summary", metavar="FILE",
+                        help="write the JSON summary of a non-interactive run to FILE instead of stdout")
+    parser.add_argument("--full-rescan", action="store_true",
+                        help="read the whole channel listing, not only the videos since the last sync")
+    parser.add_argument("--process-queue", action="store_true",
+                        help="wait for all queued post processing jobs before exiting, including those deferred to "
+                             "the transcode_window (alone: only work off the queue of earlier runs)")
+    return parser.parse_args()
+
+
+def read_sync_targets(sync_channels: list[str] | None, input_file: str | None) -> list[str]:
+    targets = []
+    if sync_channels is not None:
+        channels = [line for line in read_channel_txt_lines("channels.txt")[:-1] if line]
+        if sync_channels:
+            selected = [channel for channel in channels if any(name in channel for name in sync_channels)]
+            selected += [name for name in sync_channels if name.startswith("https://") and name not in selected]
+            channels = selected
+        targets += channels
+    if input_file:
+        with open(input_file, "r", encoding="utf-8") as file:
+            targets += [line.strip() for line in file if line.strip() and not line.lstrip().startswith("#")]
+    return targets
+
+
+def write_sync_summary(summary: list[dict], started: datetime, summary_file: str | None) -> int:
+    """Writes the machine-readable result of a non-interactive run, returns the exit code."""
+    failed = [target for target in summary if target["status"] != "ok"]
+    result = {
+        "started": started.isoformat(timespec="seconds"),
+        "finished": datetime.now().isoformat(timespec="seconds"),
+        "targets": summary,
+        "downloaded": sum(target.get("downloaded", 0) for target in summary),
+        "failed": len(failed)
+    }
+    if summary_file:
+        with open(summary_file, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=4, ensure_ascii=False)
+    else:
+        print(json.dumps(result, ensure_ascii=False))
+    return 1 if failed else 0
+
+
 def read_channel_txt_lines(filename: str) -> list[str]:
     try:
         with open(filename, "r", encoding="utf-8") as file:
@@ -530,14 +720,154 @@ def read_channel_txt_lines(filename: str) -> list[str]:
         return []
 
 
+def scan_channel_row(u_index: int, line: str, u_show_latest_video_date: bool, show_progress: bool,
+                     cancel: threading.Event | None = None) -> tuple[str, str]:
+    """Scans one channel of the selection menu, returns the (shortened) line and its latest video date column.
+
+    A set cancel stops the scan before the next video, without saving the caches of the channel.
+    """
+    latest_date_formated = ""
+    spaces = (header_width_global - 54)
+    if web_client:
+        ytchannel_info = ListingChannel(line, 'WEB')
+    else:
+        ytchannel_info = ListingChannel(line)
+    if u_show_latest_video_date:
+        ytchannel_info_channel_name = ytchannel_info.channel_name
+
+        c_year_active = print_colored_text(".", BCOLORS.BLACK)
+        c_restricted_active = print_colored_text(".", BCOLORS.BLACK)
+        c_resolution_active = print_colored_text(".", BCOLORS.BLACK)
+        c_filter_words_active = print_colored_text("." * 13, BCOLORS.BLACK)
+
+        if os.path.exists(output_dir + "/" + clean_string_regex(ytchannel_info_channel_name).rstrip() + channel_config_path):
+            c_year_active = print_colored_text("-", BCOLORS.DARK_GREEN)
+            c_restricted_active = print_colored_text("-", BCOLORS.RED)
+            c_resolution_active = print_colored_text("-", BCOLORS.YELLOW)
+            c_filter_words_active = print_colored_text("---".center(13)[:13], BCOLORS.DARK_CYAN)
+
+            ch_config = load_config(
+                output_dir + "/" + clean_string_regex(ytchannel_info_channel_name).rstrip() + channel_config_path)
+
+            if ch_config["c_year_subfolders"]=="y":
+                c_year_active = print_colored_text("Y", BCOLORS.DARK_GREEN)
+
+            if ch_config["c_only_restricted"]=="y":
+                c_restricted_active = print_colored_text("R", BCOLORS.RED)
+
+            if ch_config["c_max_resolution"]=="max":
+                c_resolution_active = print_colored_text("M", BCOLORS.YELLOW)
+            elif ch_config["c_max_resolution"]=="1080p":
+                c_resolution_active = print_colored_text("1", BCOLORS.YELLOW)
+            elif ch_config["c_max_resolution"]=="720p":
+                c_resolution_active = print_colored_text("7", BCOLORS.YELLOW)
+            elif ch_config["c_max_resolution"]=="2160p":
+                c_resolution_active = print_colored_text("2", BCOLORS.YELLOW)
+
+            if ch_config["c_filter_words"]!="":
+                c_filter_words_active = print_colored_text(ch_config["c_filter_words"].center(13)[:13], BCOLORS.DARK_CYAN)
+
+        combined_settings = c_resolution_active + c_restricted_active + c_year_active + c_filter_words_active
+
+        line = line.replace(youtube_url, "")[1:]
+        got_it = False
+        try:
+            video_filter = VideoFilter()
+            if os.path.exists(output_dir + "/" + clean_string_regex(ytchannel_info_channel_name).rstrip() + channel_config_path)\
+                    and default_filters_on:
+                video_filter = VideoFilter.from_channel_config(load_config(
+                    output_dir + "/" + clean_string_regex(ytchannel_info_channel_name).rstrip() + channel_config_path))
+
+            # FILTERS ON #################
+            if default_filters_on:
+                if show_progress:
+                    print(print_colored_text(f"\r" + " " * (len(str(u_index)) + 2) + "Scanning channel... ", BCOLORS.DARK_GREEN) +
+                          print_colored_text(ytchannel_info_channel_name, BCOLORS.GREEN), end="", flush=True)
+
+                counter = 0
+                size = ytchannel_info.video_urls
+                ch_path = output_dir + "/" + clean_string_regex(ytchannel_info_channel_name).rstrip()
+                ch_metadata_cache = metadata_cache_load(ch_path)
+                ch_rejection_cache = rejection_cache_load(ch_path)
+                ch_rejection_signature = video_filter.signature()
+                for video_iter in size:
+                    if cancel is not None and cancel.is_set():
+                        return line, latest_date_formated
+                    counter += 1
+                    if video_filter.excludes(video_iter.video_id) or video_filter.listing_check(
+                            ytchannel_info.listing.get(video_iter.video_id)) is not None or rejection_cache_check(
+                            ch_rejection_cache, video_filter, ch_rejection_signature, video_iter.video_id) is not None:
+                        continue
+                    youtube_video_object = get_video_metadata(ch_metadata_cache, video_iter.video_id)
+                    youtube_vo_video_id = youtube_video_object.video_id
+                    youtube_vo_author = ytchannel_info_channel_name
+                    youtube_vo_title = youtube_video_object.title
+                    youtube_vo_age_restricted = youtube_video_object.age_restricted
+                    youtube_vo_publish_date = youtube_video_object.publish_date
+
+                    if show_progress:
+                        print(print_colored_text(f"\r" + " " * (len(str(u_index)) + 2) + youtube_vo_author +
+                                                 " ... Find match: ", BCOLORS.DARK_GREEN) +
+                                 print_colored_text(str(counter + 1) + "/" + str(len(size)) + " | " +
+                                                     youtube_vo_video_id, BCOLORS.GREEN), end="", flush=True)
+                    rejection_reason = video_filter.rejection_reason(youtube_video_object)
+                    if rejection_reason is not None:
+                        rejection_cache_add(ch_rejection_cache, youtube_video_object, rejection_reason,
+                                            ch_rejection_signature)
+                    else:
+                        latest_video_title_text = youtube_vo_title
+                        latest_date_math = youtube_vo_publish_date.strftime(date_format_math)
+                        latest_date = youtube_vo_publish_date.strftime(date_format_display)
+                        channel_total_videos = " " + str(len(size)).rjust(5)[:5] + " | "
+                        latest_video_id_text = youtube_vo_video_id
+                        if youtube_vo_age_restricted:
+                            latest_video_id_text = print_colored_text(latest_video_id_text, BCOLORS.DARK_RED)
+                        latest_id_and_name = " | " + latest_video_id_text + print_colored_text(
+                            " | " + latest_video_title_text[:15], BCOLORS.BLACK)
+
+                        got_it = archive_index_has_date(archive_index_load(ch_path), latest_date_math)
+                        if not got_it:
+                            latest_date = print_colored_text(latest_date, BCOLORS.RED)
+                            latest_id_and_name = (print_colored_text(" | " + latest_video_id_text + " | " +
+                                                        latest_video_title_text[:15], BCOLORS.DARK_WHITE))
+                            channel_total_videos = print_colored_text(channel_total_videos, BCOLORS.DARK_WHITE)
+
+                        latest_date_formated = (
+                                " " + print_colored_text("." * ((spaces - len(str(u_index)) - len(line)) - 16),
+                                                         BCOLORS.BLACK)
+                                + combined_settings + print_colored_text(channel_total_videos, BCOLORS.BLACK)
+                                + print_colored_text(latest_date, BCOLORS.BLACK)
+                                + print_colored_text(latest_id_and_name, BCOLORS.BLACK))
+                        break
+                metadata_cache_save(ch_path, ch_metadata_cache)
+                rejection_cache_save(ch_path, ch_rejection_cache)
+                if got_it:
+                    line = print_colored_text(line, BCOLORS.BLACK)
+
+            # FILTERS OFF #################
+            else:
+                latest_date_from_channel = ytchannel_info.last_updated
+                latest_date_color = BCOLORS.BLACK
+                if latest_date_from_channel.count("hours") > 0:
+                    latest_date_color = BCOLORS.RED
+                latest_date_formated = (" " +
+                            print_colored_text("." * (spaces - len(str(u_index)) - len(line)), BCOLORS.BLACK)
+                                + combined_settings + print_colored_text(str(" updated " +
+                                 print_colored_text(latest_date_from_channel, latest_date_color)).rjust(44, ".")[:44], BCOLORS.BLACK))
+
+        except Exception as eee:
+            latest_date_formated = (" " + print_colored_text("." * ((spaces - len(str(u_index)) - len(line)) - 2), BCOLORS.BLACK)
+                                    + " " + print_colored_text(str(eee), BCOLORS.RED))
+
+    return line, latest_date_formated
+
+
 def user_selection(u_lines, u_show_latest_video_date: bool):
     """Displays the lines as a selection menu and gets user input."""
     if not u_lines:
         print("No lines available for selection.")
         return None
 
-    latest_date_formated = ""
-
     temp_disable = "y"
     if show_latest_video_date:
         temp_disable = smart_input("Skip latest Video date for this run?  Y/n", "n")
@@ -551,158 +881,69 @@ def user_selection(u_lines, u_show_latest_video_date: bool):
         u_show_latest_video_date = False
 
     print("Select channel:")
-    for u_index, line in enumerate(u_lines, start=1):
-        if not line == u_lines[(len(u_lines) - 1)]:
-            spaces = (header_width_global - 54)
-            if web_client:
-                ytchannel_info = Channel(line, 'WEB')
-            else:
-                ytchannel_info = Channel(line)
-            if u_show_latest_video_date:
-                ytchannel_info_channel_name = ytchannel_info.channel_name
-                ytchannel_info_videos = ytchannel_info.videos
-
-                c_year_active = print_colored_text(".", BCOLORS.BLACK)
-                c_restricted_active = print_colored_text(".", BCOLORS.BLACK)
-                c_resolution_active = print_colored_text(".", BCOLORS.BLACK)
-                c_filter_words_active = print_colored_text("." * 13, BCOLORS.BLACK)
-
-                if os.path.exists(output_dir + "/" + clean_string_regex(ytchannel_info_channel_name).rstrip() + channel_config_path):
-                    c_year_active = print_colored_text("-", BCOLORS.DARK_GREEN)
-                    c_restricted_active = print_colored_text("-", BCOLORS.RED)
-                    c_resolution_active = print_colored_text("-", BCOLORS.YELLOW)
-                    c_filter_words_active = print_colored_text("---".center(13)[:13], BCOLORS.DARK_CYAN)
-
-                    ch_config = load_config(
-                        output_dir + "/" + clean_string_regex(ytchannel_info_channel_name).rstrip() + channel_config_path)
-
-                    if ch_config["c_year_subfolders"]=="y":
-                        c_year_active = print_colored_text("Y", BCOLORS.DARK_GREEN)
-
-                    if ch_config["c_only_restricted"]=="y":
-                        c_restricted_active = print_colored_text("R", BCOLORS.RED)
-
-                    if ch_config["c_max_resolution"]=="max":
-                        c_resolution_active = print_colored_text("M", BCOLORS.YELLOW)
-                    elif ch_config["c_max_resolution"]=="1080p":
-                        c_resolution_active = print_colored_text("1", BCOLORS.YELLOW)
-                    elif ch_config["c_max_resolution"]=="720p":
-                        c_resolution_active = print_colored_text("7", BCOLORS.YELLOW)
-                    elif ch_config["c_max_resolution"]=="2160p":
-                        c_resolution_active = print_colored_text("2", BCOLORS.YELLOW)
-
-                    if ch_config["c_filter_words"]!="":
-                        c_filter_words_active = print_colored_text(ch_config["c_filter_words"].center(13)[:13], BCOLORS.DARK_CYAN)
-
-                combined_settings = c_resolution_active + c_restricted_active + c_year_active + c_filter_words_active
-
-                line = line.replace(youtube_url, "")[1:]
-                got_it = False
-                try:
-                    ch_config_filter_words = ""
-                    ch_config_min_duration = 0
-                    ch_config_max_duration = 9999
-                    ch_config_restricted = { True, False }
-                    ch_config_min_views = 0
-                    ch_config_exclude_list = string_to_list("")
-
-                    if os.path.exists(output_dir + "/" + clean_string_regex(ytchannel_info_channel_name).rstrip() + channel_config_path)\
-                            and default_filters_on:
-                        ch_config = load_config(output_dir + "/" + clean_string_regex(ytchannel_info_channel_name).rstrip() + channel_config_path)
-
-                        ch_config_filter_words = ch_config["c_filter_words"]
-                        # if int(main_config["min_duration_in_minutes"]) > 0:
-                        if str(ch_config["c_min_duration_in_minutes"]).strip():
-                            ch_config_min_duration = int(ch_config["c_min_duration_in_minutes"])
-                        if str(ch_config["c_max_duration_in_minutes"]).strip() and int(ch_config["c_max_duration_in_minutes"]>0):
-                            ch_config_max_duration = int(ch_config["c_max_duration_in_minutes"])
-                        if str(ch_config["c_minimum_views"]).strip():
-                            ch_config_min_views = int(ch_config["c_minimum_views"])
-                        if ch_config["c_only_restricted"]=="y":
-                            ch_config_restricted.remove(False)
-                        ch_config_exclude_list = string_to_list(ch_config["c_exclude_video_ids"])
-
-                    # FILTERS ON #################
-                    if default_filters_on:
-                        print(print_colored_text(f"\r" + " " * (len(str(u_index)) + 2) + "Scanning channel... ", BCOLORS.DARK_GREEN) +
-                              print_colored_text(ytchannel_info_channel_name, BCOLORS.GREEN), end="", flush=True)
-
-                        counter = 0
-                        size = ytchannel_info.video_urls
-                        for video_iter in ytchannel_info_videos:
-                            counter += 1
-                            youtube_video_object = video_iter
-                            youtube_vo_video_id = youtube_video_object.video_id
-                            youtube_vo_author = youtube_video_object.author
-                            youtube_vo_title = youtube_video_object.title
-                            youtube_vo_vid_info = youtube_video_object.vid_info
-                            youtube_vo_length = youtube_video_object.length
-                            youtube_vo_views = youtube_video_object.views
-                            youtube_vo_age_restricted = youtube_video_object.age_restricted
-                            youtube_vo_publish_date = youtube_video_object.publish_date
-
-                            print(print_colored_text(f"\r" + " " * (len(str(u_index)) + 2) + youtube_vo_author +
-                                                     " ... Find match: ", BCOLORS.DARK_GREEN) +
-                                     print_colored_text(str(counter + 1) + "/" + str(len(size)) + " | " +
-                                                         youtube_vo_video_id, BCOLORS.GREEN), end="", flush=True)
-                            if (youtube_vo_vid_info.get('playabilityStatus', {}).get('status') != 'UNPLAYABLE' and
-                                    youtube_vo_vid_info.get('playabilityStatus', {}).get(
-                                        'status') != 'LIVE_STREAM_OFFLINE' and
-                                    any(word.lower() in youtube_vo_title.lower() for word in
-                                        string_to_list(ch_config_filter_words))
-                                    and youtube_vo_video_id not in ch_config_exclude_list
-                                    and ch_config_min_duration <= int(youtube_vo_length / 60) <= ch_config_max_duration
-                                    and youtube_vo_views >= ch_config_min_views
-                                    and youtube_vo_age_restricted in ch_config_restricted):
-
-                                latest_video_title_text = youtube_vo_title
-                                latest_date_math = youtube_vo_publish_date.strftime(date_format_math)
-                                latest_date = youtube_vo_publish_date.strftime(date_format_display)
-                                channel_total_videos = " " + str(len(size)).rjust(5)[:5] + " | "
-                                latest_video_id_text = youtube_vo_video_id
-                                if youtube_vo_age_restricted:
-                                    latest_video_id_text = print_colored_text(latest_video_id_text, BCOLORS.DARK_RED)
-                                latest_id_and_name = " | " + latest_video_id_text + print_colored_text(
-                                    " | " + latest_video_title_text[:15], BCOLORS.BLACK)
-
-                                got_it = find_file_by_string(output_dir + "/" +
-                                                             clean_string_regex(ytchannel_info_channel_name).rstrip(),
-                                                             latest_date_math, "", False)
-                                if not got_it:
-                                    latest_date = print_colored_text(latest_date, BCOLORS.RED)
-                                    latest_id_and_name = (print_colored_text(" | " + latest_video_id_text + " | " +
-                                                                latest_video_title_text[:15], BCOLORS.DARK_WHITE))
-                                    channel_total_videos = print_colored_text(channel_total_videos, BCOLORS.DARK_WHITE)
-
-                                latest_date_formated = (
-                                        " " + print_colored_text("." * ((spaces - len(str(u_index)) - len(line)) - 16),
-                                                                 BCOLORS.BLACK)
-                                        + combined_settings + print_colored_text(channel_total_videos, BCOLORS.BLACK)
-                                        + print_colored_text(latest_date, BCOLORS.BLACK)
-                                        + print_colored_text(latest_id_and_name, BCOLORS.BLACK))
-                                break
-                        if got_it:
-                            line = print_colored_text(line, BCOLORS.BLACK)
-
-                    # FILTERS OFF #################
-                    else:
-                        latest_date_from_channel = ytchannel_info.last_updated
-                        latest_date_color = BCOLORS.BLACK
-                        if latest_date_from_channel.count("hours") > 0:
-                            latest_date_color = BCOLORS.RED
-                        latest_date_formated = (" " +
-                                    print_colored_text("." * (spaces - len(str(u_index)) - len(line)), BCOLORS.BLACK)
-                                        + combined_settings + print_colored_text(str(" updated " +
-                                         print_colored_text(latest_date_from_channel, latest_date_color)).rjust(44, ".")[:44], BCOLORS.BLACK))
-
-                except Exception as eee:
-                    latest_date_formated = (" " + print_colored_text("." * ((spaces - len(str(u_index)) - len(line)) - 2), BCOLORS.BLACK)
-                                            + " " + print_colored_text(str(eee), BCOLORS.RED))
+    rows = u_lines[:-1]
+    if not u_show_latest_video_date:
+        for u_index, line in enumerate(u_lines, start=1):
+            print(f"{u_index}. {line}", flush=True)
+        return read_user_choice(u_lines, None)
+
+    if channel_scan_workers <= 1:
+        for u_index, line in enumerate(rows, start=1):
+            line, latest_date_formated = scan_channel_row(u_index, line, u_show_latest_video_date, True)
+            print(f"\r{u_index}. {line}{latest_date_formated}", flush=True)
+        print(f"{len(u_lines)}. {u_lines[-1]}", flush=True)
+        return read_user_choice(u_lines, None)
+
+    # All channels are scanned at once, their rows are drawn right away and filled in as the scans finish
+    menu = {"lines_below": 2, "closed": False, "lock": threading.Lock()}
+    scan_cancel = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=channel_scan_workers)
+    futures = [executor.submit(scan_channel_row, u_index, line, u_show_latest_video_date, False, scan_cancel)
+               for u_index, line in enumerate(rows, start=1)]
+
+    if shutil.get_terminal_size().lines > len(u_lines) + 6:
+        for u_index, line in enumerate(rows, start=1):
+            print(f"{u_index}. {line} " + print_colored_text("scanning...", BCOLORS.BLACK), flush=True)
+        print(f"{len(u_lines)}. {u_lines[-1]}", flush=True)
+
+        def update_row(row_index: int, future) -> None:
+            try:
+                row_line, row_latest_date = future.result()
+            except Exception as row_e:
+                row_line, row_latest_date = rows[row_index], " " + print_colored_text(str(row_e), BCOLORS.RED)
+            with menu["lock"]:
+                if menu["closed"]:
+                    return
+                # save cursor (prompt line), move up to the row, rewrite it, restore cursor
+                lines_up = len(u_lines) - row_index + menu["lines_below"]
+                sys.stdout.write("\0337" + f"\033[{lines_up}A" + "\r" + BCOLORS.CLRLINE +
+                                 f"{row_index + 1}. {row_line}{row_latest_date}" + "\0338")
+                sys.stdout.flush()
+
+        for row_index, row_future in enumerate(futures):
+            row_future.add_done_callback(lambda done, i=row_index: update_row(i, done))
+    else:
+        # Menu taller than the terminal: rows can't be rewritten in place, print them in order when ready
+        for u_index, row_future in enumerate(futures, start=1):
+            try:
+                line, latest_date_formated = row_future.result()
+            except Exception as row_e:
+                line, latest_date_formated = rows[u_index - 1], " " + print_colored_text(str(row_e), BCOLORS.RED)
+            print(f"{u_index}. {line}{latest_date_formated}", flush=True)
+        print(f"{len(u_lines)}. {u_lines[-1]}", flush=True)
 
+    try:
+        return read_user_choice(u_lines, menu)
+    finally:
+        with menu["lock"]:
+            menu["closed"] = True
+        # Running scans stop before their next video; waiting for them keeps them from writing the caches of
+        # the selected channel while it is downloaded
+        scan_cancel.set()
+        executor.shutdown(wait=True, cancel_futures=True)
 
-        print(f"\r{u_index}. {line}{latest_date_formated}", flush=True)
-        latest_date_formated = ""
 
+def read_user_choice(u_lines, menu: dict | None):
     while True:
         try:
             print_asteriks_line()
@@ -713,15 +954,787 @@ def user_selection(u_lines, u_show_latest_video_date: bool):
                 print("⚠️ Invalid selection. Choose a valid number.")
         except ValueError:
             print("⚠️ Invalid input. Please enter a number.")
+        if menu is not None:
+            with menu["lock"]:
+                # prompt, warning, asterisks and the empty line in front of the next prompt
+                menu["lines_below"] += 4
+
+
+class VideoMetadata:
+    """The video fields the filters need, served from the metadata cache or a YouTube object."""
+
+    def __init__(self, video_id: str, fields: dict):
+        self.video_id = video_id
+        self.title = fields["title"]
+        self.length = fields["length"]
+        self.views = fields["views"]
+        self.publish_date = fields["publish_date"]
+        self.age_restricted = fields["age_restricted"]
+        self.playability_status = fields["playability_status"]
+
+
+def read_metadata_field(yt: YouTube, field: str):
+    if field == "playability_status":
+        return yt.vid_info.get('playabilityStatus', {}).get('status')
+    return getattr(yt, field)
+
+
+def metadata_cache_load(directory: str) -> dict:
+    return {"videos": cc_load_config(directory + metadata_cache_path), "dirty": False}
+
+
+def metadata_cache_save(directory: str, cache: dict) -> None:
+    if not cache["dirty"] or not os.path.exists(directory):
+        return
+    try:
+        with metadata_cache_lock, open(directory + metadata_cache_path, "w", encoding="utf-8") as f:
+            json.dump(cache["videos"], f)
+            cache["dirty"] = False
+    except OSError as save_e:
+        print(f"❌ Error saving metadata cache: {save_e}")
+
+
+def get_video_metadata(cache: dict, video_id: str, keep_session: bool = False) -> VideoMetadata:
+    """Returns the filter fields of a video, only fetching unknown or stale fields from YouTube.
+
+    With keep_session the fetched YouTube object stays in the video_session for the download.
+    """
+    now = time.time()
+    with metadata_cache_lock:
+        cached = dict(cache["videos"].get(video_id, {}))
+    stale_fields = [field for field, ttl_hours in metadata_cache_ttl.items()
+                    if field not in cached or now - cached[field]["fetched"] > float(ttl_hours) * 3600]
+
+    if stale_fields:
+        with metrics_stage("metadata", video_id=video_id, fields=len(stale_fields)):
+            if keep_session:
+                yt = video_session(video_id).youtube()
+            else:
+                yt = create_youtube(video_id, False)
+            for field in stale_fields:
+                value = read_metadata_field(yt, field)
+                if field == "publish_date" and value is not None:
+                    value = value.isoformat()
+                cached[field] = {"value": value, "fetched": now}
+        with metadata_cache_lock:
+            cache["videos"][video_id] = cached
+            cache["dirty"] = True
+    else:
+        metrics_record({"stage": "metadata", "video_id": video_id, "fields": 0, "outcome": "cached"}, now)
 
+    fields = {field: cached[field]["value"] for field in metadata_cache_ttl}
+    if fields["publish_date"] is not None:
+        fields["publish_date"] = datetime.fromisoformat(fields["publish_date"])
+    return VideoMetadata(video_id, fields)
 
-def delete_temp_files() -> None:
-    video_file, audio_file = find_media_files(".")
+
+def prefetch_video_metadata(cache: dict, video_ids: list[str], workers: int):
+    """Yields the metadata of video_ids in the given order, resolving up to 2 * workers ids ahead in parallel."""
+    if workers <= 1:
+        for video_id in video_ids:
+            yield get_video_metadata(cache, video_id, True)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    video_ids_iter = iter(video_ids)
+    try:
+        for video_id in video_ids_iter:
+            pending.append(executor.submit(get_video_metadata, cache, video_id, True))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            future = pending.popleft()
+            next_video_id = next(video_ids_iter, None)
+            if next_video_id is not None:
+                pending.append(executor.submit(get_video_metadata, cache, next_video_id, True))
+            yield future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def rejection_cache_load(directory: str) -> dict:
+    return {"videos": cc_load_config(directory + rejection_cache_path), "dirty": False}
+
+
+def rejection_cache_save(directory: str, cache: dict) -> None:
+    if not cache["dirty"] or not os.path.exists(directory):
+        return
+    try:
+        with open(directory + rejection_cache_path, "w", encoding="utf-8") as f:
+            json.dump(cache["videos"], f)
+            cache["dirty"] = False
+    except OSError as save_e:
+        print(f"❌ Error saving rejection cache: {save_e}")
+
+
+def rejection_cache_add(cache: dict, video: VideoMetadata, reason: str, signature: str) -> None:
+    """Records why a video was rejected, with the values it was judged on."""
+    values = {field: getattr(video, field) for field in metadata_cache_ttl}
+    if values["publish_date"] is not None:
+        values["publish_date"] = values["publish_date"].isoformat()
+    cache["videos"][video.video_id] = {"reason": reason, "filter": signature, "values": values,
+                                       "judged": time.time()}
+    cache["dirty"] = True
+
+
+def rejection_cache_discard(cache: dict, video_id: str) -> None:
+    if cache["videos"].pop(video_id, None) is not None:
+        cache["dirty"] = True
+
+
+def rejection_cache_check(cache: dict, video_filter: "VideoFilter", signature: str, video_id: str) -> str | None:
+    """'rejected' or 'pending' if an earlier rejection still holds, None if the video has to be looked at again.
+
+    Under other filters the recorded values are judged again, a rejection expires with the metadata_cache_ttl_hours
+    of the field it was made for.
+    """
+    record = cache["videos"].get(video_id)
+    if record is None:
+        return None
+    reason = record["reason"]
+    if record["filter"] != signature:
+        fields = dict(record["values"])
+        if fields["publish_date"] is not None:
+            fields["publish_date"] = datetime.fromisoformat(fields["publish_date"])
+        reason = video_filter.rejection_reason(VideoMetadata(video_id, fields))
+    if reason is None or time.time() - record["judged"] > float(metadata_cache_ttl[reason]) * 3600:
+        return None
+    return "pending" if reason in ("views", "playability_status") else "rejected"
+
+
+class ListingChannel(Channel):
+    """Channel that keeps the listing data of its videos (title, length, views, age) from the pages it pages through."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.listing = {}
+
+    def _extract_videos(self, raw_json, context=None):
+        page = raw_json if isinstance(raw_json, dict) else json.loads(raw_json)
+        for renderer in find_video_renderers(page):
+            self.listing[renderer["videoId"]] = parse_listing_renderer(renderer)
+        return super()._extract_videos(raw_json, context)
+
+    def videos_since(self, video_id: str):
+        """The videos newer than video_id, paging stops there (the whole listing if the video is gone)."""
+        for page in self._paginate(self.html):
+            for video in page:
+                if video.video_id == video_id:
+                    return
+                yield video
+
+
+class ListingPlaylist(Playlist):
+    """Playlist read from its listing pages alone: video ids in playlist order plus the listing data, no YouTube
+    object per video."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.listing = {}
+
+    def _extract_videos(self, raw_json, context=None):
+        page = raw_json if isinstance(raw_json, dict) else json.loads(raw_json)
+        for renderer in find_video_renderers(page, "playlistVideoRenderer"):
+            self.listing[renderer["videoId"]] = parse_listing_renderer(renderer)
+        return super()._extract_videos(raw_json, context)
+
+    def video_ids(self, first_page_only: bool = False):
+        """The video ids in playlist order, the next pages are requested while the current one is read."""
+        pages = self._paginate(self.html)
+        if first_page_only:
+            # Comes with the playlist page itself, no further request
+            pages = [next(pages, [])]
+        elif playlist_prefetch_pages > 0:
+            pages = prefetch_pages(pages, playlist_prefetch_pages)
+        for page in pages:
+            for watch_path in page:
+                if isinstance(watch_path, str):
+                    yield pytubefix.extract.video_id(watch_path)
+
+    def marker(self) -> dict | None:
+        """Length, last update and first page of the playlist, an unchanged marker means an unchanged playlist."""
+        try:
+            last_updated = self.last_updated
+        except (KeyError, IndexError, TypeError):
+            return None
+        # Only a date is exact enough, "Updated today" stays the same for every change of the day
+        if not isinstance(last_updated, date):
+            return None
+        try:
+            length = self.length
+        except (KeyError, IndexError, TypeError, ValueError):
+            return None
+        return {"length": length, "last_updated": last_updated.isoformat(),
+                "first_page": list(self.video_ids(first_page_only=True))}
+
+
+def prefetch_pages(pages, depth: int):
+    """Iterates a page generator in a background thread that stays up to depth pages ahead of the reader."""
+    buffer = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+
+    def hand_over(item: tuple) -> bool:
+        # Gives up once the reader is gone, instead of waiting for buffer space forever
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def producer() -> None:
+        try:
+            for page in pages:
+                if not hand_over(("page", page)):
+                    return
+            hand_over(("done", None))
+        except Exception as page_e:
+            hand_over(("error", page_e))
+
+    threading.Thread(target=producer, daemon=True).start()
+    try:
+        while True:
+            kind, value = buffer.get()
+            if kind == "error":
+                raise value
+            if kind == "done":
+                return
+            yield value
+    finally:
+        stopped.set()
+
+
+def find_video_renderers(node, key: str = "videoRenderer") -> list[dict]:
+    renderers = []
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, dict):
+            renderer = node.get(key)
+            if isinstance(renderer, dict) and "videoId" in renderer:
+                renderers.append(renderer)
+            else:
+                pending.extend(node.values())
+        elif isinstance(node, list):
+            pending.extend(node)
+    return renderers
+
+
+def listing_text(renderer: dict, key: str) -> str | None:
+    text = renderer.get(key)
+    if not isinstance(text, dict):
+        return None
+    if "simpleText" in text:
+        return text["simpleText"]
+    if "runs" in text:
+        return "".join(run.get("text", "") for run in text["runs"])
+    return None
+
+
+def parse_listing_length(text: str | None) -> int | None:
+    """'1:02:03' -> 3723 seconds."""
+    if not text or not all(part.strip().isdigit() for part in text.split(":")):
+        return None
+    seconds = 0
+    for part in text.split(":"):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+def parse_listing_views(text: str | None) -> int | None:
+    """'1,234 views' -> 1234, abbreviated ('1.2K views') or live ('12 watching') counts are not used."""
+    if not text:
+        return None
+    if text.strip().lower() == "no views":
+        return 0
+    match = re.fullmatch(r"([\d,.\s]+) views?", text.strip())
+    if match is None:
+        return None
+    digits = re.sub(r"\D", "", match.group(1))
+    return int(digits) if digits else None
+
+
+def parse_listing_years(text: str | None, now: datetime) -> tuple[int, int] | None:
+    """'Streamed 3 years ago' -> (earliest, latest) possible publishing year, with a day of margin on each side."""
+    if not text:
+        return None
+    match = re.search(r"(\d+)\s+(second|minute|hour|day|week|month|year)s?\s+ago", text)
+    if match is None:
+        return None
+    amount = int(match.group(1))
+    shortest, longest = LISTING_AGE_UNITS[match.group(2)]
+    # YouTube rounds down ("1 year ago" up to 23 months), so the video is at most amount + 1 units old
+    earliest = now - timedelta(days=(amount + 1) * longest + 1)
+    latest = now - timedelta(days=max(amount * shortest - 1, 0))
+    return earliest.year, latest.year
+
+
+def parse_listing_renderer(renderer: dict) -> dict:
+    # Playlist entries have no publishedTimeText, their videoInfo reads "1.2K views • 3 years ago"
+    published = listing_text(renderer, "publishedTimeText") or listing_text(renderer, "videoInfo")
+    return {"title": listing_text(renderer, "title"),
+            "length": parse_listing_length(listing_text(renderer, "lengthText")),
+            "views": parse_listing_views(listing_text(renderer, "viewCountText")),
+            "years": parse_listing_years(published, datetime.now())}
+
+
+def filter_number(value) -> int:
+    """Prompt answers and channel config values ("", "0", 5) -> int, anything else counts as disabled (0)."""
+    return int(value) if str(value).strip().isdigit() else 0
+
+
+class VideoFilter:
+    """The video filters of a channel (channel config and prompt answers), compiled once per run.
+
+    Checks that need no request (exclude list, channel listing data) come first, the metadata checks run from the
+    cheapest to the most volatile field and only the enabled ones are evaluated.
+    """
+
+    def __init__(self, filter_words: str = "", min_duration=0, max_duration=0, min_year=0, max_year=0, min_views=0,
+                 only_restricted: bool = False, skip_restricted: bool = False, exclude_ids: list[str] | None = None):
+        words = [word.lower() for word in string_to_list(filter_words)] if filter_words != "" else []
+        self.title_pattern = re.compile("|".join(re.escape(word) for word in words)) if words else None
+        self.min_duration = filter_number(min_duration)
+        self.max_duration = filter_number(max_duration)
+        if self.max_duration <= self.min_duration:
+            self.max_duration = 0
+        self.min_year = filter_number(min_year)
+        self.max_year = filter_number(max_year)
+        self.min_views = filter_number(min_views)
+        self.only_restricted = only_restricted
+        self.skip_restricted = skip_restricted
+        # Empty entries ("" from an empty c_exclude_video_ids, trailing commas) would change the signature only
+        self.exclude_ids = {video_id for video_id in exclude_ids or [] if video_id}
+        # (metadata field, predicate rejecting a video for it)
+        self.predicates = []
+        if self.title_pattern is not None:
+            self.predicates.append(("title", lambda video: not self.title_matches(video.title)))
+        if self.min_duration or self.max_duration:
+            self.predicates.append(("length", lambda video: self.duration_rejects(video.length)))
+        if self.min_year or self.max_year:
+            self.predicates.append(("publish_date", lambda video: video.publish_date is not None and
+                                    self.year_rejects(video.publish_date.year, video.publish_date.year)))
+
+    @classmethod
+    def from_channel_config(cls, ch_config: dict) -> "VideoFilter":
+        return cls(ch_config["c_filter_words"], ch_config["c_min_duration_in_minutes"],
+                   ch_config["c_max_duration_in_minutes"], ch_config["c_minimum_year"], ch_config["c_maximum_year"],
+                   ch_config["c_minimum_views"], ch_config["c_only_restricted"] == "y",
+                   ch_config["c_skip_restricted"] == "y",
+                   clean_youtube_urls(string_to_list(ch_config["c_exclude_video_ids"])))
+
+    def excludes(self, video_id: str) -> bool:
+        return video_id in self.exclude_ids
+
+    def title_matches(self, title: str) -> bool:
+        return self.title_pattern is None or self.title_pattern.search(title.lower()) is not None
+
+    def duration_rejects(self, seconds: int) -> bool:
+        minutes = int(seconds / 60)
+        return (self.min_duration > 0 and minutes <= self.min_duration) or (
+                self.max_duration > 0 and minutes >= self.max_duration)
+
+    def year_rejects(self, earliest_year: int, latest_year: int) -> bool:
+        """True if every year between earliest_year and latest_year is out of the year bounds."""
+        return (self.min_year > 0 and latest_year <= self.min_year) or (
+                self.max_year > 0 and earliest_year >= self.max_year)
+
+    def listing_check(self, entry: dict | None) -> str | None:
+        """'rejected' or 'pending' if the channel listing data alone rules a video out, None if it does not.
+
+        Fields the listing lacks never reject a video.
+        """
+        if entry is None:
+            return None
+        if ((entry["title"] is not None and not self.title_matches(entry["title"])) or
+                (entry["length"] is not None and self.duration_rejects(entry["length"])) or
+                (entry["years"] is not None and self.year_rejects(*entry["years"]))):
+            return "rejected"
+        if entry["views"] is not None and 0 < self.min_views and entry["views"] <= self.min_views:
+            return "pending"
+        return None
+
+    def rejection_reason(self, video: VideoMetadata) -> str | None:
+        """The metadata field a video is rejected for, None if it passes the filters."""
+        for field, predicate in self.predicates:
+            if predicate(video):
+                return field
+        if (video.age_restricted and self.skip_restricted) or (not video.age_restricted and self.only_restricted):
+            return "age_restricted"
+        if 0 < self.min_views and video.views <= self.min_views:
+            return "views"
+        if video.playability_status in ('UNPLAYABLE', 'LIVE_STREAM_OFFLINE'):
+            return "playability_status"
+        return None
+
+    def check(self, video: VideoMetadata) -> str:
+        """'accepted', 'accepted_restricted' (age restricted, needs OAuth), 'rejected' or 'pending'.
+
+        'pending' videos are rejected for now, but their views or playability can still change.
+        """
+        reason = self.rejection_reason(video)
+        if reason is None:
+            return "accepted_restricted" if video.age_restricted else "accepted"
+        return "pending" if reason in ("views", "playability_status") else "rejected"
+
+    def signature(self, *settings) -> str:
+        """Hash of the filters and the given download settings, changes whenever one of them does."""
+        values = [self.title_pattern.pattern if self.title_pattern is not None else None, self.min_duration,
+                  self.max_duration, self.min_year, self.max_year, self.min_views, self.only_restricted,
+                  self.skip_restricted, sorted(self.exclude_ids), *settings]
+        return hashlib.sha1(json.dumps(values).encode("utf-8")).hexdigest()[:16]
+
+
+def metrics_record(event: dict, started: float) -> None:
+    """Appends a stage event to this run's JSONL file and adds it to the Prometheus textfile series."""
+    global metrics_file
+    if not metrics_directory and not metrics_prometheus_file:
+        return
+    event = {"time": datetime.now().isoformat(timespec="milliseconds"), "run": metrics_run,
+             "channel": metrics_channel, **event, "duration": round(time.time() - started, 4)}
+    with metrics_lock:
+        if metrics_directory:
+            if metrics_file is None:
+                os.makedirs(metrics_directory, exist_ok=True)
+                metrics_file = open(os.path.join(metrics_directory, f"ytdl_{metrics_run}.jsonl"), "a",
+                                    encoding="utf-8", buffering=1)
+            metrics_file.write(json.dumps(event, ensure_ascii=False) + "\n")
+        if metrics_prometheus_file:
+            metrics_add_series(event)
+    if metrics_prometheus_file and time.time() - metrics_written > 15:
+        metrics_write_prometheus()
+
+
+def metrics_add_series(event: dict) -> None:
+    global metrics_series
+    if metrics_series is None:
+        metrics_series = {}
+        if os.path.exists(metrics_prometheus_file):
+            with open(metrics_prometheus_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip() and not line.startswith("#"):
+                        series, value = line.rsplit(" ", 1)
+                        metrics_series[series] = float(value)
+    labels = f'stage="{event["stage"]}",outcome="{event["outcome"]}"'
+    for bucket in METRICS_BUCKETS + ["+Inf"]:
+        series = f'ytdl_stage_duration_seconds_bucket{{{labels},le="{bucket}"}}'
+        metrics_series[series] = metrics_series.get(series, 0) + (bucket == "+Inf" or event["duration"] <= bucket)
+    for suffix, value in (("sum", event["duration"]), ("count", 1)):
+        series = f"ytdl_stage_duration_seconds_{suffix}{{{labels}}}"
+        metrics_series[series] = metrics_series.get(series, 0) + value
+    if event.get("bytes"):
+        series = f'ytdl_stage_bytes_total{{stage="{event["stage"]}"}}'
+        metrics_series[series] = metrics_series.get(series, 0) + event["bytes"]
+    metrics_series["ytdl_last_event_timestamp_seconds"] = time.time()
+
+
+def metrics_write_prometheus() -> None:
+    """Rewrites the textfile for node_exporter's textfile collector (atomically, as the collector requires)."""
+    global metrics_written
+    if not metrics_prometheus_file or metrics_series is None:
+        return
+    metric_types = {"ytdl_stage_duration_seconds": ("histogram", "Duration of the YTDL stages"),
+                    "ytdl_stage_bytes_total": ("counter", "Bytes handled by the YTDL stages"),
+                    "ytdl_last_event_timestamp_seconds": ("gauge", "Time of the last recorded stage event")}
+    with metrics_lock:
+        lines = []
+        for name, (metric_type, description) in metric_types.items():
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {metric_type}"]
+            lines += [f"{series} {value:g}" for series, value in sorted(metrics_series.items())
+                      if series.split("{")[0] == name or series.split("{")[0].rsplit("_", 1)[0] == name]
+        temporary_file = metrics_prometheus_file + ".tmp"
+        try:
+            with open(temporary_file, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(temporary_file, metrics_prometheus_file)
+        except OSError as metrics_e:
+            print(f"❌ Error writing metrics: {metrics_e}")
+        metrics_written = time.time()
+
+
+@contextmanager
+def metrics_stage(stage: str, **fields):
+    """Times the enclosed block as one stage event, the yielded dict takes further fields (bytes, codec, ...)."""
+    event = {"stage": stage, **fields}
+    started = time.time()
+    try:
+        yield event
+    except BaseException as stage_e:
+        event.setdefault("outcome", "cancelled" if isinstance(stage_e, (KeyboardInterrupt, InterruptedError))
+                         else "error")
+        event.setdefault("error", str(stage_e))
+        raise
+    finally:
+        event.setdefault("outcome", "ok")
+        metrics_record(event, started)
+
+
+def metrics_timed(stage: str, job_function, **fields):
+    """Returns job_function wrapped in metrics_stage(), for calls handed to threads and the postprocess queue."""
+    def timed_function(*arguments):
+        with metrics_stage(stage, **fields):
+            return job_function(*arguments)
+    return timed_function
+
+
+def stream_metrics_fields(stream, video_id: str) -> dict:
+    return {"video_id": video_id, "bytes": stream.filesize, "resolution": stream.resolution,
+            "codec": ",".join(stream.codecs), "itag": stream.itag}
+
+
+def delete_temp_files(directory: str = ".") -> None:
+    video_file, audio_file = find_media_files(directory)
     # Check if files exist before deleting
-    if video_file and os.path.exists(video_file):
-        os.remove(video_file)
-    if audio_file and os.path.exists(audio_file):
-        os.remove(audio_file)
+    if video_file and os.path.exists(os.path.join(directory, video_file)):
+        os.remove(os.path.join(directory, video_file))
+    if audio_file and os.path.exists(os.path.join(directory, audio_file)):
+        os.remove(os.path.join(directory, audio_file))
+
+
+def create_job_directory(video_id: str) -> str:
+    """Every video gets its own scratch directory, so downloads and ffmpeg jobs of different videos can overlap."""
+    job_directory = os.path.join(temp_directory, video_id)
+    os.makedirs(job_directory, exist_ok=True)
+    return job_directory
+
+
+def remove_job_directory(job_directory: str) -> None:
+    active_job_directories.discard(job_directory)
+    shutil.rmtree(job_directory, ignore_errors=True)
+
+
+def cleanup_job_directories() -> None:
+    """Removes abandoned scratch directories.
+
+    Downloaded streams, partial downloads with their resume sidecar and jobs waiting for ffmpeg are kept, unless
+    nothing touched the directory for job_directory_max_age_days.
+    """
+    if not os.path.exists(temp_directory):
+        return
+    for name in os.listdir(temp_directory):
+        job_directory = os.path.join(temp_directory, name)
+        if not os.path.isdir(job_directory) or job_directory in active_job_directories:
+            continue
+        files = os.listdir(job_directory)
+        resumable = any(file == streams_complete_file or file.endswith(".part.json") for file in files)
+        last_change = max([os.path.getmtime(os.path.join(job_directory, file)) for file in files], default=0)
+        if resumable and time.time() - last_change < job_directory_max_age_days * 86400:
+            continue
+        shutil.rmtree(job_directory, ignore_errors=True)
+
+
+def streams_complete(job_directory: str, res: str) -> bool:
+    """True if a previous run downloaded all streams for this resolution and mode, but didn't finish ffmpeg."""
+    marker = cc_load_config(os.path.join(job_directory, streams_complete_file))
+    return marker.get("audio_only") == audio_or_video_bool and (audio_or_video_bool or marker.get("resolution") == res)
+
+
+def ffmpeg_command(*arguments: str, show_stats: bool | None = None) -> list[str]:
+    # ffmpeg progress is only shown when it runs inline, in the pipeline it would mix with the download progress bar
+    if show_stats is None:
+        show_stats = postprocess_queue_size <= 0
+    stats = "-stats" if show_stats else "-nostats"
+    return ["ffmpeg", "-nostdin", "-loglevel", "quiet", stats, "-y", *arguments]
+
+
+def transcode_threads_per_job() -> int:
+    """ffmpeg -threads of an encoding job, transcode_threads within transcode_cpu_budget (0 = all cores)."""
+    budget = transcode_cpu_budget or os.cpu_count() or 1
+    if transcode_threads > 0:
+        return min(transcode_threads, budget)
+    return budget
+
+
+def postprocess_pool(job: dict) -> str:
+    """The worker pool of a job: encode for the TRANSCODE_STAGES, copy for the rest, so that a quick merge never
+    waits behind an encode."""
+    return "encode" if job["stage"] in TRANSCODE_STAGES else "copy"
+
+
+def postprocess_worker_count(pool: str) -> int:
+    if pool == "copy":
+        return postprocess_copy_workers
+    # As many encodes at a time as fit into the CPU budget, e.g. 8 cores with 2 threads each -> 4 workers
+    return max(1, (transcode_cpu_budget or os.cpu_count() or 1) // transcode_threads_per_job())
+
+
+def transcode_priority(command: list[str]) -> list[str]:
+    """Prefixes an encoding ffmpeg command with nice/ionice, so it gives way to everything else on the machine."""
+    prefix = []
+    if transcode_nice and shutil.which("nice"):
+        prefix += ["nice", "-n", str(transcode_nice)]
+    if transcode_ionice and shutil.which("ionice"):
+        prefix += ["ionice", "-c", "2", "-n", "7"]  # lowest best-effort I/O priority
+    return prefix + command
+
+
+def transcode_window_open() -> bool:
+    """False while encoding stages are deferred, i.e. outside the transcode_window (always open if not set)."""
+    if not transcode_window:
+        return True
+    return time_window_active(transcode_window, datetime.now().strftime("%H:%M"))
+
+
+def postprocess_job(stage: str, video_id: str, publish_date: str, res: str, year: str, restricted: bool,
+                    tags: dict, job_directory: str) -> dict:
+    """Describes an ffmpeg stage with everything it needs, so the job can be persisted and run after a restart."""
+    return {
+        "stage": stage,
+        "video_id": video_id,
+        "publish_date": publish_date,
+        "resolution": res,
+        "year": year,
+        "restricted": restricted,
+        "channel_path": ytchannel_path,
+        "output_policy": output_policy,
+        "audio_format": audio_format,
+        "tags": tags,
+        "job_directory": job_directory,
+        "queued": datetime.now().isoformat(timespec="seconds")
+    }
+
+
+def postprocess_run(job: dict) -> None:
+    job_functions = {"audio_remux": convert_audio, "audio_encode": convert_audio, "transcode": convert_webm_to_mp4,
+                     "merge": merge_video_audio}
+    fields = {"video_id": job["video_id"]}
+    if job["stage"].startswith("audio_"):
+        fields["audio_format"] = job["audio_format"]
+    else:
+        fields["resolution"] = job["resolution"]
+    metrics_timed(job["stage"], job_functions[job["stage"]], **fields)(job)
+
+
+def postprocess_runnable(job: dict) -> bool:
+    # Jobs that failed in this run are retried by the next one (up to postprocess_max_attempts)
+    if job.get("failed_run") == metrics_run:
+        return False
+    return job["stage"] not in TRANSCODE_STAGES or transcode_window_open()
+
+
+def postprocess_queue_save() -> None:
+    """Writes the queued and running jobs to postprocess_queue_file, called with postprocess_condition held."""
+    try:
+        os.makedirs(temp_directory, exist_ok=True)
+        cc_save_config(os.path.join(temp_directory, postprocess_queue_file), postprocess_active + postprocess_jobs)
+    except OSError as save_e:
+        print(f"❌ Error saving the post processing queue: {save_e}")
+
+
+def postprocess_enqueue(job: dict) -> None:
+    # A resubmitted job (e.g. streams found again by a rescan) is already waiting for its turn
+    if any(queued["job_directory"] == job["job_directory"] for queued in postprocess_active + postprocess_jobs):
+        return
+    active_job_directories.add(job["job_directory"])
+    postprocess_jobs.append(job)
+    postprocess_queue_save()
+    pool = postprocess_pool(job)
+    while postprocess_workers[pool] < postprocess_worker_count(pool):
+        threading.Thread(target=postprocess_worker, args=(pool,), daemon=True).start()
+        postprocess_workers[pool] += 1
+    postprocess_condition.notify_all()
+
+
+def postprocess_next_job(pool: str) -> dict | None:
+    return next((queued for queued in postprocess_jobs
+                 if postprocess_pool(queued) == pool and postprocess_runnable(queued)), None)
+
+
+def postprocess_worker(pool: str) -> None:
+    global postprocess_failures
+    while True:
+        with postprocess_condition:
+            job = postprocess_next_job(pool)
+            while job is None:
+                # Also wakes up every minute to notice the start of the transcode_window
+                postprocess_condition.wait(timeout=60)
+                job = postprocess_next_job(pool)
+            postprocess_jobs.remove(job)
+            postprocess_active.append(job)
+        try:
+            postprocess_run(job)
+        except Exception as job_e:
+            with postprocess_condition:
+                postprocess_failures += 1
+                postprocess_failed_videos.add(job["video_id"])
+                job["attempts"] = job.get("attempts", 0) + 1
+                job["failed_run"] = metrics_run
+                if job["attempts"] < postprocess_max_attempts:
+                    postprocess_jobs.append(job)
+                else:
+                    active_job_directories.discard(job["job_directory"])
+            print(print_colored_text(f"\n❌ Post processing of {job['video_id']} failed: {job_e}", BCOLORS.RED))
+        finally:
+            with postprocess_condition:
+                postprocess_active.remove(job)
+                postprocess_queue_save()
+                postprocess_condition.notify_all()
+
+
+def submit_postprocess(job: dict) -> None:
+    """Runs an ffmpeg stage inline or hands it to the persistent post processing queue and its worker pool.
+
+    Downloads only wait while more than postprocess_queue_size jobs could start right away, jobs deferred to the
+    transcode_window never hold them up. A failed inline stage is counted like a failed queued job, its downloaded
+    streams stay for the next run.
+    """
+    global postprocess_failures
+    if postprocess_queue_size <= 0 and not transcode_window:
+        active_job_directories.add(job["job_directory"])
+        try:
+            postprocess_run(job)
+        except Exception as job_e:
+            with postprocess_condition:
+                postprocess_failures += 1
+                postprocess_failed_videos.add(job["video_id"])
+            print(print_colored_text(f"\n❌ Post processing of {job['video_id']} failed: {job_e}", BCOLORS.RED))
+        finally:
+            active_job_directories.discard(job["job_directory"])
+        return
+    with postprocess_condition:
+        postprocess_enqueue(job)
+        while sum(postprocess_runnable(queued) for queued in postprocess_jobs) > max(postprocess_queue_size, 0):
+            postprocess_condition.wait(timeout=60)
+
+
+def postprocess_queue_resume() -> None:
+    """Queues the jobs an earlier run left in postprocess_queue_file, if their downloaded streams are still there."""
+    jobs = cc_load_config(os.path.join(temp_directory, postprocess_queue_file))
+    resumed = 0
+    with postprocess_condition:
+        for job in jobs if isinstance(jobs, list) else []:
+            if (job.get("attempts", 0) < postprocess_max_attempts
+                    and os.path.exists(os.path.join(job["job_directory"], streams_complete_file))):
+                postprocess_enqueue(job)
+                resumed += 1
+        postprocess_queue_save()
+    if resumed:
+        print(print_colored_text(f"Resuming {resumed} queued post processing job(s)\n", BCOLORS.BLACK))
+
+
+def postprocess_pending(deferred: bool) -> bool:
+    if postprocess_active:
+        return True
+    return any(postprocess_runnable(queued) or deferred and queued.get("failed_run") != metrics_run
+               for queued in postprocess_jobs)
+
+
+def wait_for_postprocess(deferred: bool = False) -> None:
+    """Waits for the queued jobs that can run now, or with deferred also for those waiting for the transcode_window.
+
+    Jobs left over stay in postprocess_queue_file for the next run.
+    """
+    with postprocess_condition:
+        if postprocess_pending(deferred):
+            print(print_colored_text("\nWaiting for post processing to finish...", BCOLORS.BLACK))
+        while postprocess_pending(deferred):
+            postprocess_condition.wait(timeout=60)
+        waiting = len(postprocess_jobs)
+    if waiting:
+        print(print_colored_text(f"\n{waiting} post processing job(s) queued for a later run or the transcode window",
+                                 BCOLORS.BLACK))
 
 
 def find_media_files(fmf_path: str) -> tuple[str | None, str | None]:
@@ -751,34 +1764,279 @@ def print_resolutions(yt: YouTube) -> list[str]:
     return unique_resolutions
 
 
-def find_file_by_string(directory: str, search_string: str, resolution: str, mp3: bool) -> str | None:
+def stream_codec(stream) -> str:
+    """'avc1.640028' -> 'avc1', 'vp09.00.51.08' -> 'vp9', 'mp4a.40.2' -> 'aac'."""
+    codec = (stream.video_codec if stream.includes_video_track else stream.audio_codec) or ""
+    codec = codec.split(".")[0]
+    return {"vp09": "vp9", "mp4a": "aac"}.get(codec, codec)
+
+
+class StreamSelectionError(Exception):
+    """The stream manifest of a video has no separate audio (or video) stream to download, e.g. progressive only."""
+
+
+def select_streams(yt: YouTube, limit: str) -> dict:
+    """Picks the video and audio stream for the output policy from the stream manifest.
+
+    Video: the highest resolution up to limit, at equal resolution streams the output container takes without
+    re-encoding, SDR, the stream_codecs order and the lower bitrate come first. With avoid_transcode a lower resolution
+    that can be copied wins over a transcode. Audio: the highest bitrate the container (or the audio_format) takes as
+    it is, default track. Audio only, transcode means the audio has to be encoded into the audio_format.
+    """
+    adaptive = [stream for stream in yt.streams if stream.is_adaptive]
+    audio_streams = [stream for stream in adaptive if not stream.includes_video_track]
+    if not audio_streams:
+        raise StreamSelectionError("no audio stream")
+    if audio_or_video_bool:
+        audio_codecs = AUDIO_FORMAT_CODECS[audio_format]
+    else:
+        audio_codecs = OUTPUT_AUDIO_CODECS[output_policy]
+    audio_streams = [stream for stream in audio_streams
+                     if audio_codecs is None or stream_codec(stream) in audio_codecs] or audio_streams
+    audio_streams = [stream for stream in audio_streams if stream.is_default_audio_track] or audio_streams
+    selection = {"video": None, "audio": max(audio_streams, key=lambda stream: stream.bitrate or 0),
+                 "resolution": "max", "transcode": False}
+    if audio_or_video_bool:
+        selection["transcode"] = audio_codecs is None or stream_codec(selection["audio"]) not in audio_codecs
+        return selection
+
+    video_codecs = OUTPUT_VIDEO_CODECS[output_policy]
+    video_streams = [stream for stream in adaptive if stream.includes_video_track and stream.resolution]
+    if not video_streams:
+        raise StreamSelectionError("no video stream")
+    candidates = [stream for stream in video_streams
+                  if limit == "max" or extract_number(stream.resolution) <= extract_number(limit)]
+    if not candidates:
+        lowest = min(extract_number(stream.resolution) for stream in video_streams)
+        candidates = [stream for stream in video_streams if extract_number(stream.resolution) == lowest]
+
+    def copyable(stream) -> bool:
+        return video_codecs is None or stream_codec(stream) in video_codecs
+
+    if avoid_transcode and any(copyable(stream) for stream in candidates):
+        candidates = [stream for stream in candidates if copyable(stream)]
+    codec_order = [codec.lower() for codec in stream_codecs]
+    video = min(candidates, key=lambda stream: (
+        -extract_number(stream.resolution), not copyable(stream), bool(stream.is_hdr),
+        codec_order.index(stream_codec(stream)) if stream_codec(stream) in codec_order else len(codec_order),
+        stream.bitrate or 0))
+    selection.update({"video": video, "resolution": video.resolution, "transcode": not copyable(video)})
+    return selection
+
+
+def parse_archive_file_name(file_name: str) -> dict | None:
+    """Parses "<date> - <res> - <title> - <id>.mp4" or "<date> - <title> - <id>.m4a" into its parts."""
+    match = ARCHIVE_FILE_NAME_PATTERN.match(file_name)
+    if not match:
+        return None
+    return {
+        "video_id": match.group("video_id"),
+        "publish_date": match.group("publish_date"),
+        "resolution": match.group("resolution") or "",
+        "container": match.group("container")
+    }
+
+
+def archive_index_scan_directory(directory: str, scanned: dict, rel_dir: str) -> list[str]:
+    """Reads a single directory of the channel tree into scanned (video id -> entries), returns its sub
+    directories."""
+    sub_directories = []
+    with os.scandir(os.path.join(directory, rel_dir)) as it:
+        for dir_entry in it:
+            rel_path = os.path.join(rel_dir, dir_entry.name)
+            if dir_entry.is_dir():
+                sub_directories.append(rel_path)
+            elif dir_entry.is_file():
+                file_info = parse_archive_file_name(dir_entry.name)
+                if file_info:
+                    scanned.setdefault(file_info["video_id"], []).append({
+                        "file": rel_path,
+                        "resolution": file_info["resolution"],
+                        "container": file_info["container"],
+                        "publish_date": file_info["publish_date"],
+                        "mtime": dir_entry.stat().st_mtime
+                    })
+    return sub_directories
+
+
+def archive_index_load(directory: str) -> dict:
+    """Loads the archive index of a channel directory and reconciles it with the file system.
+
+    Only directories whose mtime changed since the last run (files added, renamed or deleted) are read again,
+    so an unchanged archive costs one stat() per directory instead of a full os.walk per video.
+    """
+    index = {"directories": {}, "videos": {}, "base_directory": directory, "dates": set()}
+    if not os.path.exists(directory):
+        return index
+
+    index_file = directory + archive_index_path
+    if os.path.exists(index_file):
+        try:
+            with open(index_file, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            index = {"directories": {}, "videos": {}}
+
+    seen_directories = set()
+    stale_directories = set()  # changed or removed, their entries are replaced by the scanned ones
+    scanned = {}
+    pending = [""]
+    while pending:
+        rel_dir = pending.pop()
+        try:
+            mtime = os.stat(os.path.join(directory, rel_dir)).st_mtime
+        except FileNotFoundError:
+            continue
+        seen_directories.add(rel_dir)
+        known = index["directories"].get(rel_dir)
+        if known and known["mtime"] == mtime:
+            pending.extend(known["subdirs"])
+        else:
+            sub_directories = archive_index_scan_directory(directory, scanned, rel_dir)
+            index["directories"][rel_dir] = {"mtime": mtime, "subdirs": sub_directories}
+            pending.extend(sub_directories)
+            stale_directories.add(rel_dir)
+
+    for rel_dir in list(index["directories"]):
+        if rel_dir not in seen_directories:
+            del index["directories"][rel_dir]
+            stale_directories.add(rel_dir)
+
+    # One pass over the index however many directories changed, a cold build only adds the scanned entries
+    if stale_directories and index["videos"]:
+        for video_id in list(index["videos"]):
+            entries = [entry for entry in index["videos"][video_id]
+                       if os.path.dirname(entry["file"]) not in stale_directories]
+            if entries:
+                index["videos"][video_id] = entries
+            else:
+                del index["videos"][video_id]
+    for video_id, entries in scanned.items():
+        index["videos"].setdefault(video_id, []).extend(entries)
+
+    index["base_directory"] = directory
+    index["dates"] = {entry["publish_date"] for entries in index["videos"].values() for entry in entries}
+    if stale_directories:
+        archive_index_save(directory, index)
+    return index
+
+
+def archive_index_save(directory: str, index: dict) -> None:
+    if not os.path.exists(directory):
+        return
+    try:
+        # Rewritten in place: replacing the file would change the directory mtime and force a rescan on next load
+        with open(directory + archive_index_path, "w", encoding="utf-8") as f:
+            json.dump({"directories": index["directories"], "videos": index["videos"]}, f)
+    except OSError as save_e:
+        print(f"❌ Error saving archive index: {save_e}")
+
+
+def archive_index_find(index: dict, video_id: str, resolution: str, audio_only: bool) -> str | None:
+    """The archived file of a video id in the wanted resolution ("max" = any), looked up in the archive index.
+
+    Audio in any audio_format counts, so changing the format doesn't download an archive again.
+    """
     if resolution=="max":
         resolution = ""
-    if mp3:
-        resolution = "mp3"
 
-    if not os.path.exists(directory):
-        return None
+    for entry in index["videos"].get(video_id, []):
+        if ((entry["container"] in AUDIO_FORMAT_CODECS) == audio_only
+                and resolution in os.path.basename(entry["file"])):
+            return os.path.join(index.get("base_directory", ""), entry["file"])
 
-    for root, _, files in os.walk(directory):  # os.walk() traverses all subdirectories
-        for filename in files:
-            if search_string in filename and resolution in filename:
-                return os.path.join(root, filename)  # Return full file path of the first match
+    return None
 
-    return None  # Return None if no file is found
 
+def archive_index_has_date(index: dict, publish_date: str) -> bool:
+    return publish_date in index["dates"]
+
+
+def archive_index_add(file_path: str) -> None:
+    """Adds a finished download to the archive index of the current channel."""
+    file_info = parse_archive_file_name(os.path.basename(file_path))
+    if not file_info or not os.path.exists(file_path) or archive_index is None:
+        return
+    rel_path = os.path.relpath(file_path, archive_index["base_directory"])
+    if rel_path.startswith(os.pardir):
+        # Finished by a post processing job of another channel, its index picks the file up on the next load
+        return
+    # Post processing workers finish files at the same time
+    with archive_index_lock:
+        entries = [entry for entry in archive_index["videos"].get(file_info["video_id"], [])
+                   if entry["file"] != rel_path]
+        entries.append({
+            "file": rel_path,
+            "resolution": file_info["resolution"],
+            "container": file_info["container"],
+            "publish_date": file_info["publish_date"],
+            "mtime": os.path.getmtime(file_path)
+        })
+        archive_index["videos"][file_info["video_id"]] = entries
+        archive_index["dates"].add(file_info["publish_date"])
+        archive_index_save(archive_index["base_directory"], archive_index)
+
+
+def sync_state_save(directory: str, state: dict, listing_video_ids: list[str], pending: list[str],
+                    watermark_id: str | None, filter_signature: str, metadata_cache: dict) -> None:
+    """Moves the watermark of a finished channel sync to the newest listed video.
+
+    listing_video_ids are newest first. Pending videos (rejected for views or playability) are kept in the state and
+    looked at again by the next incremental sync, however far below the watermark they are.
+    """
+    newest_id = listing_video_ids[0] if listing_video_ids else state["video_id"]
+    now = datetime.now().isoformat(timespec="seconds")
+    if newest_id != state.get("video_id"):
+        publish_date = metadata_cache["videos"].get(newest_id, {}).get("publish_date", {}).get("value")
+        state = {**state, "video_id": newest_id, "publish_date": publish_date}
+    state.update({"pending": pending, "filter": filter_signature, "updated": now})
+    if watermark_id is None:
+        state["full_scan"] = now
+    try:
+        cc_save_config(directory + sync_state_path, state)
+    except OSError as save_e:
+        print(f"❌ Error saving sync state: {save_e}")
+
+
+def sync_state_current(state: dict) -> bool:
+    """True if a sync may build on state: incremental_sync, no --full-rescan and a full scan within full_rescan_days."""
+    if not incremental_sync or arguments.full_rescan or "full_scan" not in state:
+        return False
+    last_full_scan = datetime.fromisoformat(state["full_scan"])
+    return full_rescan_days <= 0 or (datetime.now() - last_full_scan).days < full_rescan_days
 
-def limit_resolution(resolution: str, limit: str) -> str:
-    num_resolution = int(''.join(filter(str.isdigit, resolution)))  # Extract number from first resolution
-    num_limit: int = 0
-    if limit!="max":
-        num_limit = int(''.join(filter(str.isdigit, limit)))  # Extract number from second resolution
-    if limit=="max" or num_resolution < num_limit:
-        max_resolution = resolution
-    else:
-        max_resolution = limit
 
-    return max_resolution
+def playlist_listing(playlist: ListingPlaylist, state: dict, use_cache: bool) -> tuple[list[str], bool]:
+    """The video ids of a playlist in playlist order, and whether they are the cached ones from state.
+
+    With an unchanged marker (length, last update date, first page) an unchanged playlist costs only the playlist
+    page request, otherwise all listing pages are read and cached in state.
+    """
+    marker = playlist.marker()
+    if use_cache and marker is not None and state.get("marker") == marker and "video_ids" in state:
+        playlist.listing.update(state.get("listing", {}))
+        return state["video_ids"], True
+    video_ids = list(playlist.video_ids())
+    state.update({"marker": marker, "video_ids": video_ids,
+                  "listing": {video_id: playlist.listing[video_id] for video_id in video_ids
+                              if video_id in playlist.listing}})
+    return video_ids, False
+
+
+def playlist_state_save(directory: str, states: dict, playlist_id: str, state: dict, pending: set, full_scan: bool,
+                        filter_signature: str) -> None:
+    """Marks the videos of a finished playlist sync as handled, except pending ones (rejected for views or
+    playability), they are looked at again next time."""
+    now = datetime.now().isoformat(timespec="seconds")
+    state.update({"handled": [video_id for video_id in state["video_ids"] if video_id not in pending],
+                  "filter": filter_signature, "updated": now})
+    if full_scan:
+        state["full_scan"] = now
+    states[playlist_id] = state
+    try:
+        cc_save_config(directory + playlist_state_path, states)
+    except OSError as save_e:
+        print(f"❌ Error saving playlist state: {save_e}")
 
 
 def create_directories(restricted: bool, year: str) -> None:
@@ -794,26 +2052,514 @@ def find_json_files(directory: str) -> list[str]:
     return [str(file) for file in Path(directory).rglob("*.json")]
 
 
+def time_window_active(window: dict, now: str) -> bool:
+    """True if the time now ("HH:MM") lies in the {"from": "HH:MM", "to": "HH:MM"} window."""
+    if window["from"] <= window["to"]:
+        return window["from"] <= now < window["to"]
+    return now >= window["from"] or now < window["to"]  # window over midnight
+
+
+def current_bandwidth_limit():
+    """Returns the limit in Mbit/s of the active bandwidth_schedule window (or bandwidth_limit_mbit).
+
+    0 means unlimited, "pause" stops all downloads until the window ends.
+    """
+    now = datetime.now().strftime("%H:%M")
+    for window in bandwidth_schedule:
+        if time_window_active(window, now):
+            return window["mbit"]
+    return bandwidth_limit_mbit
+
+
+def bandwidth_wait_paused() -> None:
+    """Blocks while a "pause" window of bandwidth_schedule is active.
+
+    Called before a range request is opened, a response left open during the pause would run into its timeout.
+    """
+    while current_bandwidth_limit() == "pause" and not downloads_cancelled.is_set():
+        time.sleep(10)
+
+
+def bandwidth_acquire(byte_count: int) -> None:
+    """Token bucket shared by all downloads of this process and, via a locked state file, of other instances.
+
+    Bytes are taken from the shared bucket in batches of bandwidth_batch_seconds of transfer and handed out from a
+    local credit, so the state file is locked and rewritten about once per batch instead of once per block. A
+    negative balance is waited off before a batch is handed out. A range already open when a "pause" window starts
+    is finished, bandwidth_wait_paused() holds back the next one.
+    """
+    limit = current_bandwidth_limit()
+    if limit == "pause" or not limit or float(limit) <= 0:
+        return
+    rate = float(limit) * 1_000_000 / 8  # bytes per second
+
+    # Held while a batch is waited off, the other downloads of this process need the same batch
+    with bandwidth_lock:
+        if bandwidth_local["rate"] != rate:
+            bandwidth_local.update({"rate": rate, "credit": 0.0})
+        if bandwidth_local["credit"] < byte_count:
+            batch = max(byte_count - bandwidth_local["credit"], rate * bandwidth_batch_seconds)
+            tokens = bandwidth_take(rate, batch)
+            if tokens < 0:
+                time.sleep(-tokens / rate)
+            bandwidth_local["credit"] += batch
+        bandwidth_local["credit"] -= byte_count
+
+
+def bandwidth_take(rate: float, byte_count: float) -> float:
+    """Takes byte_count from the shared bucket, returns its balance afterwards. Called with bandwidth_lock held."""
+    state_file = None
+    state = bandwidth_memory_state
+    if fcntl is not None:
+        state_file = open(bandwidth_state_path, "a+", encoding="utf-8")
+        fcntl.flock(state_file, fcntl.LOCK_EX)
+        state_file.seek(0)
+        try:
+            state = json.loads(state_file.read() or "{}")
+        except json.JSONDecodeError:
+            state = {}
+    try:
+        now = time.time()
+        tokens = 0.0
+        if state.get("rate") == rate:
+            tokens = min(rate, state["tokens"] + (now - state["time"]) * rate)
+        tokens -= byte_count
+        state.update({"rate": rate, "tokens": tokens, "time": now})
+        if state_file is not None:
+            state_file.seek(0)
+            state_file.truncate()
+            state_file.write(json.dumps(state))
+    finally:
+        if state_file is not None:
+            fcntl.flock(state_file, fcntl.LOCK_UN)
+            state_file.close()
+    return tokens
+
+
+def http_pool_count(host: str, field: str, amount: int = 1) -> None:
+    with http_pool_lock:
+        stats = http_pool_stats.setdefault(host, {"opened": 0, "reused": 0, "requests": 0, "bytes": 0})
+        stats[field] += amount
+
+
+def http_pool_snapshot() -> dict:
+    with http_pool_lock:
+        return {host: dict(stats) for host, stats in http_pool_stats.items()}
+
+
+def print_http_pool_stats() -> None:
+    for host, stats in sorted(http_pool_snapshot().items()):
+        print(print_colored_text(f"HTTP {host}: {stats['requests']} requests, {stats['opened']} connections opened, "
+                                 f"{stats['reused']} reused, {stats['bytes'] / 1024 / 1024:.1f} MB", BCOLORS.BLACK))
+
+
+class PooledResponse:
+    """urlopen-like response that hands its keep-alive connection back to the pool once the body is read."""
+
+    def __init__(self, url: str, response: http.client.HTTPResponse, key: tuple, connection, pooled: bool):
+        self.url = url
+        self.response = response
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.msg
+        self.key = key
+        self.connection = connection
+        self.pooled = pooled
+
+    def read(self, amount: int | None = None) -> bytes:
+        data = self.response.read() if amount is None or amount < 0 else self.response.read(amount)
+        http_pool_count(self.key[1], "bytes", len(data))
+        if self.response.isclosed():
+            self.release(not self.response.will_close)
+        return data
+
+    def info(self):
+        return self.headers
+
+    def getcode(self) -> int:
+        return self.status
+
+    def geturl(self) -> str:
+        return self.url
+
+    def release(self, reuse: bool) -> None:
+        connection, self.connection = self.connection, None
+        if connection is None:
+            return
+        if reuse and self.pooled:
+            with http_pool_lock:
+                http_pool_idle.setdefault(self.key, []).append(connection)
+        else:
+            connection.close()
+        if self.pooled:
+            http_pool_slots[self.key].release()
+
+    def close(self) -> None:
+        # A partially read body leaves the connection in an unknown state, it is only reused when drained
+        self.release(self.response.isclosed() and not self.response.will_close)
+        self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        self.release(False)
+
+
+class HttpxResponse:
+    """urlopen-like wrapper around a streamed httpx response (HTTP/2)."""
+
+    def __init__(self, url: str, response):
+        self.url = url
+        self.response = response
+        self.status = response.status_code
+        self.reason = response.reason_phrase
+        self.headers = response.headers
+        self.host = response.url.host
+        self.blocks = response.iter_bytes()
+        self.buffer = b""
+
+    def read(self, amount: int | None = None) -> bytes:
+        while amount is None or amount < 0 or len(self.buffer) < amount:
+            block = next(self.blocks, b"")
+            if not block:
+                break
+            self.buffer += block
+        if amount is None or amount < 0:
+            amount = len(self.buffer)
+        data, self.buffer = self.buffer[:amount], self.buffer[amount:]
+        http_pool_count(self.host, "bytes", len(data))
+        return data
+
+    def info(self):
+        return self.headers
+
+    def getcode(self) -> int:
+        return self.status
+
+    def geturl(self) -> str:
+        return self.url
+
+    def close(self) -> None:
+        self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def http_pool_install(max_per_host: int, http2: bool) -> None:
+    """Routes pytubefix and the range downloads through the shared keep-alive session pool."""
+    global http_pool_enabled, http_pool_max_per_host, http_pool_client
+    pytubefix.request._execute_request = http_pool_execute_request
+    if urllib.request.getproxies():
+        return  # keep urllib, it is the one honoring the proxy environment variables
+    http_pool_max_per_host = max(1, max_per_host)
+    if http2 and httpx is not None and http_pool_client is None:
+        try:
+            http_pool_client = httpx.Client(http2=True, follow_redirects=True,
+                                            limits=httpx.Limits(max_keepalive_connections=http_pool_max_per_host))
+        except ImportError:
+            print(print_colored_text("HTTP/2 needs the h2 package (pip install \"httpx[http2]\")", BCOLORS.RED))
+    http_pool_enabled = True
+
+
+def http_pool_open(url: str, method: str, headers: dict, data: bytes | None, timeout) -> PooledResponse:
+    parts = urllib.parse.urlsplit(url)
+    https = parts.scheme == "https"
+    key = (parts.scheme, parts.hostname, parts.port or (443 if https else 80))
+    path = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+    with http_pool_lock:
+        slot = http_pool_slots.setdefault(key, threading.Semaphore(http_pool_max_per_host))
+    # A leaked response must not block everyone else forever, past the timeout the connection is not pooled
+    pooled = slot.acquire(timeout=60)
+    for attempt in range(2):
+        with http_pool_lock:
+            idle = http_pool_idle.get(key)
+            connection = idle.pop() if idle and pooled else None
+        reused = connection is not None
+        if reused:
+            connection.timeout = timeout
+            if connection.sock is not None and timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
+                connection.sock.settimeout(timeout)
+            http_pool_count(key[1], "reused")
+        else:
+            connection_class = http.client.HTTPSConnection if https else http.client.HTTPConnection
+            connection = connection_class(key[1], key[2], timeout=timeout)
+            http_pool_count(key[1], "opened")
+        try:
+            connection.request(method, path, body=data, headers=headers)
+            response = connection.getresponse()
+        except ConnectionError:
+            connection.close()
+            if reused and attempt == 0:
+                continue  # the server dropped the idle keep-alive connection, retry on a fresh one
+            if pooled:
+                slot.release()
+            raise
+        except BaseException:
+            connection.close()
+            if pooled:
+                slot.release()
+            raise
+        http_pool_count(key[1], "requests")
+        return PooledResponse(url, response, key, connection, pooled)
+
+
+def http_pool_request(url: str, method: str | None = None, headers: dict | None = None, data: bytes | None = None,
+                      timeout=socket._GLOBAL_DEFAULT_TIMEOUT):
+    """urlopen() replacement on top of the session pool: follows redirects and raises urllib's HTTPError."""
+    method = method or ("POST" if data is not None else "GET")
+    headers = dict(headers or {})
+    if data is not None and not any(name.lower() == "content-type" for name in headers):
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+    if not http_pool_enabled:
+        return urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers, method=method),
+                                      timeout=timeout)
+    if http_pool_client is not None:
+        http_timeout = None if timeout is socket._GLOBAL_DEFAULT_TIMEOUT else timeout
+        request = http_pool_client.build_request(method, url, headers=headers, content=data, timeout=http_timeout)
+        response = HttpxResponse(url, http_pool_client.send(request, stream=True))
+        http_pool_count(response.host, "requests")
+    else:
+        for _ in range(10):
+            response = http_pool_open(url, method, headers, data, timeout)
+            location = response.info().get("Location")
+            if response.status not in HTTP_REDIRECT_CODES or not location:
+                break
+            response.read()
+            response.close()
+            url = urllib.parse.urljoin(url, location)
+            if response.status in (301, 302, 303) and method != "HEAD":
+                method, data = "GET", None
+                headers = {name: value for name, value in headers.items() if name.lower() != "content-type"}
+    if response.status in HTTP_REDIRECT_CODES or response.status >= 400:
+        raise urllib.error.HTTPError(url, response.status, response.reason, response.info(), response)
+    return response
+
+
+def http_pool_execute_request(url: str, method: str | None = None, headers: dict | None = None, data=None,
+                              timeout=socket._GLOBAL_DEFAULT_TIMEOUT):
+    """Drop-in for pytubefix.request._execute_request."""
+    request_headers = dict(HTTP_DEFAULT_HEADERS)
+    if headers:
+        request_headers.update(headers)
+    if data and not isinstance(data, bytes):
+        data = bytes(json.dumps(data), encoding="utf-8")
+    if not url.lower().startswith("http"):
+        raise ValueError("Invalid URL")
+    return http_pool_request(url, method, request_headers, data, timeout)
+
+
+def create_youtube(video_id: str, restricted: bool) -> YouTube:
+    if restricted:
+        if web_client:
+            return YouTube(youtube_watch_url + video_id, 'WEB', use_oauth=True, allow_oauth_cache=True,
+                           on_progress_callback=on_progress)
+        return YouTube(youtube_watch_url + video_id, use_oauth=True, allow_oauth_cache=True,
+                       on_progress_callback=on_progress)
+    if web_client:
+        return YouTube(youtube_watch_url + video_id, 'WEB', on_progress_callback=on_progress)
+    return YouTube(youtube_watch_url + video_id, on_progress_callback=on_progress)
+
+
+class VideoSession:
+    """One video from the metadata fetch to its download: the YouTube object (player response, stream manifest) and
+    the resolutions parsed from it. Resolved again only if OAuth is needed or the stream URLs are about to expire."""
+
+    def __init__(self, video_id: str):
+        self.video_id = video_id
+        self.yt = None
+        self.restricted = False
+        self.resolved = 0.0
+        self.resolution_list = None
+        self.selection = None
+
+    def youtube(self, restricted: bool = False) -> YouTube:
+        if self.yt is None or (restricted and not self.restricted) or self.expiring():
+            self.refresh(restricted)
+        return self.yt
+
+    def refresh(self, restricted: bool) -> YouTube:
+        self.yt = create_youtube(self.video_id, restricted)
+        self.restricted = restricted
+        self.resolved = time.time()
+        self.resolution_list = None
+        self.selection = None
+        return self.yt
+
+    def expiring(self) -> bool:
+        expires_in = str(self.yt.vid_info.get("streamingData", {}).get("expiresInSeconds", ""))
+        return expires_in.isdigit() and self.resolved + int(expires_in) - time.time() < video_session_expiry_margin
+
+    def resolutions(self) -> list[str]:
+        if self.resolution_list is None:
+            self.resolution_list = print_resolutions(self.yt)
+        return self.resolution_list
+
+    def streams(self, limit: str) -> dict:
+        if self.selection is None:
+            self.selection = select_streams(self.yt, limit)
+        return self.selection
+
+
+def video_session(video_id: str) -> VideoSession:
+    with video_sessions_lock:
+        if video_id not in video_sessions:
+            video_sessions[video_id] = VideoSession(video_id)
+        return video_sessions[video_id]
+
+
+def video_session_close(video_id: str) -> None:
+    with video_sessions_lock:
+        video_sessions.pop(video_id, None)
+
+
+def stream_url_parameter(url: str, parameter: str) -> str:
+    return urllib.parse.parse_qs(urllib.parse.urlparse(url).query).get(parameter, [""])[0]
+
+
+def http_get_range(url: str, start: int, end: int):
+    """Yields the bytes start..end (inclusive) of a stream URL in blocks."""
+    with http_pool_request(url + f"&range={start}-{end}", headers=HTTP_DEFAULT_HEADERS, timeout=30) as response:
+        while True:
+            block = response.read(65536)
+            if not block:
+                break
+            yield block
+
+
+def download_stream(stream, job_directory: str, video_id: str, restricted: bool, show_progress: bool) -> str:
+    """Downloads a stream over download_connections parallel range requests of download_chunk_size bytes.
+
+    The file is preallocated as <name>.part, every range is written in place and recorded in the <name>.part.json
+    sidecar, so an interrupted download continues with the missing ranges on the next attempt. A stream that was
+    already completed by an earlier attempt is kept as it is. Expired or rejected stream URLs are resolved again.
+    Progress is reported through the on_progress callback of the YouTube object.
+    """
+    file_path = os.path.join(job_directory, stream.default_filename)
+    part_path = file_path + ".part"
+    sidecar_path = part_path + ".json"
+    filesize = stream.filesize
+    if not filesize:
+        return stream.download(output_path=job_directory)
+    if os.path.exists(file_path) and os.path.getsize(file_path) == filesize:
+        print(print_colored_text(f"Already downloaded: {stream.default_filename}", BCOLORS.BLACK))
+        return file_path
+
+    sidecar = {
+        "video_id": video_id,
+        "itag": stream.itag,
+        "filesize": filesize,
+        "validator": stream_url_parameter(stream.url, "lmt"),
+        "chunk_size": download_chunk_size,
+        "done": []
+    }
+    previous_sidecar = cc_load_config(sidecar_path)
+    if os.path.exists(part_path) and {**previous_sidecar, "done": []} == sidecar:
+        sidecar["done"] = previous_sidecar["done"]
+        print(print_colored_text(f"Resuming download ({len(sidecar['done'])} of "
+                                 f"{-(-filesize // download_chunk_size)} parts done)", BCOLORS.BLACK))
+    else:
+        with open(part_path, "wb") as part_file:
+            part_file.truncate(filesize)
+        cc_save_config(sidecar_path, sidecar)
+
+    ranges = queue.Queue()
+    done_bytes = 0
+    for start in range(0, filesize, download_chunk_size):
+        if start in sidecar["done"]:
+            done_bytes += min(start + download_chunk_size, filesize) - start
+        else:
+            ranges.put((start, min(start + download_chunk_size, filesize) - 1))
+    progress = {"remaining": filesize - done_bytes, "errors": [], "url": stream.url}
+    progress_lock = threading.Lock()
+
+    def refresh_url(failed_url: str) -> None:
+        with progress_lock:
+            if progress["url"] == failed_url:
+                progress["url"] = video_session(video_id).refresh(restricted).streams.get_by_itag(stream.itag).url
+
+    expire = stream_url_parameter(stream.url, "expire")
+    if expire.isdigit() and int(expire) - time.time() < 60:
+        refresh_url(stream.url)
+
+    def range_worker() -> None:
+        with open(part_path, "r+b") as worker_file:
+            while not progress["errors"]:
+                try:
+                    start, end = ranges.get_nowait()
+                except queue.Empty:
+                    return
+                for attempt in range(3):
+                    bandwidth_wait_paused()
+                    position = start
+                    url = progress["url"]
+                    try:
+                        worker_file.seek(start)
+                        for block in http_get_range(url, start, end):
+                            if downloads_cancelled.is_set():
+                                return
+                            bandwidth_acquire(len(block))
+                            worker_file.write(block)
+                            position += len(block)
+                            with progress_lock:
+                                progress["remaining"] -= len(block)
+                                if show_progress and stream._monostate.on_progress:
+                                    stream._monostate.on_progress(stream, block, progress["remaining"])
+                        if position != end + 1:
+                            raise IOError(f"incomplete range {start}-{end}")
+                        worker_file.flush()
+                        with progress_lock:
+                            sidecar["done"].append(start)
+                            cc_save_config(sidecar_path, sidecar)
+                        break
+                    except Exception as range_e:
+                        with progress_lock:
+                            progress["remaining"] += position - start
+                        if isinstance(range_e, urllib.error.HTTPError) and range_e.code == 403:
+                            refresh_url(url)
+                        if attempt == 2:
+                            progress["errors"].append(range_e)
+
+    workers = [threading.Thread(target=range_worker, daemon=True) for _ in range(max(1, download_connections))]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except BaseException:
+        downloads_cancelled.set()
+        raise
+    if progress["errors"]:
+        raise progress["errors"][0]
+    if downloads_cancelled.is_set():
+        raise InterruptedError("Download cancelled")
+
+    os.replace(part_path, file_path)
+    os.remove(sidecar_path)
+    return file_path
+
+
 def download_video(channel_name: str, video_id: str, counter_id: int, video_total_count: int,
-                   video_views: int, restricted: bool) -> None:
+                   video_views: int, restricted: bool, publish_date: datetime | None = None) -> None:
     restricted_path_snippet = ""
     colored_video_id = video_id
     header_width = (header_width_global + 11)
+    session = video_session(video_id)
+    y_tube = session.youtube(restricted)
+    if publish_date is not None:
+        # Known from the metadata, saves the watch page request
+        y_tube.publish_date = publish_date
     if restricted:
-        if web_client:
-            y_tube = YouTube(youtube_watch_url + video_id, 'WEB', use_oauth=True, allow_oauth_cache=True,
-                     on_progress_callback=on_progress)
-        else:
-            y_tube = YouTube(youtube_watch_url + video_id, use_oauth=True, allow_oauth_cache=True,
-                             on_progress_callback=on_progress)
         restricted_path_snippet = "restricted/"
         colored_video_id = print_colored_text(video_id, BCOLORS.RED)
         header_width = (header_width_global + 20)
-    else:
-        if web_client:
-            y_tube = YouTube(youtube_watch_url + video_id, 'WEB', on_progress_callback=on_progress)
-        else:
-            y_tube = YouTube(youtube_watch_url + video_id, on_progress_callback=on_progress)
 
     y_tube_publish_date = y_tube.publish_date
     y_tube_title = y_tube.title
@@ -834,184 +2580,365 @@ def download_video(channel_name: str, video_id: str, counter_id: int, video_tota
     else:
         year = ""
 
-    res = max(print_resolutions(y_tube), key=lambda x: int(x.rstrip('p')))
-    if limit_resolution_to != "max":
-        res = limit_resolution(res, limit_resolution_to)
+    try:
+        with metrics_stage("stream_selection", video_id=video_id) as selection_event:
+            selection = session.streams(limit_resolution_to)
+            res = selection["resolution"]
+            selection_event.update({"resolution": res, "transcode": selection["transcode"],
+                                    "codec": stream_codec(selection["video"] or selection["audio"])})
+    except StreamSelectionError as selection_e:
+        unusable_stream_videos.add(video_id)
+        print(print_colored_text(f"\nSkipping {video_id}: {selection_e}\n", BCOLORS.RED))
+        return
 
-    print_video_infos(y_tube, res, video_views)
+    print_video_infos(y_tube, res, video_views, session.resolutions())
 
-    if os.path.exists(
-            ytchannel_path + year + "/" + restricted_path_snippet + str(publishing_date) + " - " + res + " - " +
-            clean_string_regex(y_tube_title) + " - " + video_id + ".mp4") and not audio_or_video_bool:
-        print(print_colored_text("\nVideo already downloaded\n", BCOLORS.GREEN))
+    output_base = ytchannel_path + year + "/" + restricted_path_snippet + str(publishing_date) + " - "
+    if audio_or_video_bool:
+        # Audio in any of the audio formats counts
+        already_downloaded = any(os.path.exists(output_base + clean_string_regex(y_tube_title) + " - " + video_id
+                                                + "." + audio_container) for audio_container in AUDIO_FORMAT_CODECS)
     else:
+        already_downloaded = os.path.exists(output_base + res + " - " + clean_string_regex(y_tube_title) + " - "
+                                            + video_id + "." + output_container())
+    if already_downloaded:
         if audio_or_video_bool:
-            if os.path.exists(ytchannel_path + year + "/" + restricted_path_snippet +
-                        str(publishing_date) + " - " + clean_string_regex(y_tube_title) + " - " + video_id + ".mp3"):
-                print(print_colored_text("\nMP3 already downloaded\n", BCOLORS.GREEN))
-
-        more_than1080p = False
-
-        if res == "2160p" or res == "1440p":
-            more_than1080p = True
-            video_file_tmp, audio_file_tmp = find_media_files("tmp")
-            if video_file_tmp is not None:
-                path = (ytchannel_path + str(year) + "/" + restricted_path_snippet + str(publishing_date) + " - " + res + " - "
-                        + clean_string_regex(os.path.splitext(video_file_tmp)[0]) + " - " + video_id + ".mp4")
-                print(print_colored_text("\nMerged file still available!", BCOLORS.BLACK))
-                convert_webm_to_mp4("tmp/" + video_file_tmp, path, year, restricted)
-            else:
-                download_video_process(y_tube, res, more_than1080p, publishing_date, year, restricted)
+            print(print_colored_text("\nAudio already downloaded\n", BCOLORS.GREEN))
         else:
-            download_video_process(y_tube, res, more_than1080p, publishing_date, year, restricted)
+            print(print_colored_text("\nVideo already downloaded\n", BCOLORS.GREEN))
+    else:
+        job_directory = create_job_directory(video_id)
+        tags = {"title": y_tube_title, "artist": y_tube.author, "date": publishing_date,
+                "comment": youtube_watch_url + video_id}
+
+        # Only a video stream the output container can't take as it is gets re-encoded (see select_streams)
+        if streams_complete(job_directory, res):
+            print(print_colored_text("\nDownloaded streams still available!", BCOLORS.BLACK))
+            submit_streams_postprocess(video_id, publishing_date, res, selection["transcode"], year, restricted, tags,
+                                       job_directory)
+        else:
+            download_video_process(y_tube, selection, publishing_date, year, restricted, tags, job_directory)
 
 
-def download_video_process(yt: YouTube, res: str, more_than1080p: bool, publishing_date: str, year: str,
-                           restricted: bool) -> None:
-    if not audio_or_video_bool:
-        print(print_colored_text("\nDownloading VIDEO...", BCOLORS.BLACK))
+def download_video_process(yt: YouTube, selection: dict, publishing_date: str, year: str, restricted: bool,
+                           tags: dict, job_directory: str) -> None:
+    downloads_cancelled.clear()
+    audio_stream = selection["audio"]
+    video_stream = selection["video"]
+    res = selection["resolution"]
 
-        for idx, i in enumerate(yt.streams):
-            if i.resolution == res:
-                break
-        yt.streams[idx].download()
+    # Streaming needs named pipes (not available on Windows), transcoding is CPU bound and gains nothing from it
+    if streaming_merge and hasattr(os, "mkfifo") and not selection["transcode"]:
+        try:
+            with metrics_stage("streaming_merge", video_id=yt.video_id, resolution=res):
+                stream_merge(yt.video_id, video_stream, audio_stream, publishing_date, res, year, restricted, tags,
+                             job_directory)
+            return
+        except Exception as stream_e:
+            print(print_colored_text(f"\nStreaming merge failed ({stream_e}), downloading streams...", BCOLORS.RED))
 
-    print(print_colored_text("\nDownloading AUDIO...", BCOLORS.BLACK))
+    if audio_or_video_bool:
+        print(print_colored_text("\nDownloading AUDIO...", BCOLORS.BLACK))
+        with metrics_stage("audio_download", **stream_metrics_fields(audio_stream, yt.video_id)):
+            download_stream(audio_stream, job_directory, yt.video_id, restricted, True)
+    else:
+        # Both streams are fetched at the same time, the progress bar follows the (larger) video stream
+        print(print_colored_text("\nDownloading VIDEO + AUDIO...", BCOLORS.BLACK))
+        executor = ThreadPoolExecutor(max_workers=2)
+        try:
+            video_download = executor.submit(
+                metrics_timed("video_download", download_stream, **stream_metrics_fields(video_stream, yt.video_id)),
+                video_stream, job_directory, yt.video_id, restricted, True)
+            audio_download = executor.submit(
+                metrics_timed("audio_download", download_stream, **stream_metrics_fields(audio_stream, yt.video_id)),
+                audio_stream, job_directory, yt.video_id, restricted, False)
+            # The first failure stops the other stream right away, not only after it finished
+            done, _ = wait((video_download, audio_download), return_when=FIRST_EXCEPTION)
+            for download in done:
+                download.result()
+            video_download.result()
+            audio_download.result()
+        except BaseException:
+            # Stops the range workers of the other stream, both keep their resume sidecar
+            downloads_cancelled.set()
+            raise
+        finally:
+            executor.shutdown(wait=False)
+
+    rename_files_in_temp_directory(job_directory)
+    cc_save_config(os.path.join(job_directory, streams_complete_file),
+                   {"audio_only": audio_or_video_bool, "resolution": res})
+
+    submit_streams_postprocess(yt.video_id, publishing_date, res, selection["transcode"], year, restricted, tags,
+                               job_directory)
+
+
+def feed_stream_to_pipe(stream, pipe_path: str, show_progress: bool, errors: list) -> None:
+    """Writes the stream body into a named pipe that ffmpeg reads from, range by range as ffmpeg consumes it."""
+    try:
+        remaining = stream.filesize
+        with open(pipe_path, "wb") as pipe:
+            for start in range(0, stream.filesize, download_chunk_size):
+                end = min(start + download_chunk_size, stream.filesize) - 1
+                bandwidth_wait_paused()
+                for block in http_get_range(stream.url, start, end):
+                    if downloads_cancelled.is_set():
+                        return
+                    bandwidth_acquire(len(block))
+                    pipe.write(block)
+                    remaining -= len(block)
+                    if show_progress and stream._monostate.on_progress:
+                        stream._monostate.on_progress(stream, block, remaining)
+    except Exception as feed_e:
+        errors.append(feed_e)
+
+
+def stream_merge(video_id: str, video_stream, audio_stream, publish_date: str, video_resolution: str, year: str,
+                 restricted: bool, tags: dict, job_directory: str) -> None:
+    """Pipes the HTTP bodies of the streams straight into ffmpeg, no stream is written to disk before muxing.
+
+    MP4 output is fragmented, so ffmpeg writes it as the data arrives and doesn't need a second pass to move the
+    index to the front. Audio only, the piped audio stream is remuxed into the audio_format.
+    """
+    restricted_path = "/"
+    if restricted:
+        restricted_path = "/restricted/"
+    create_directories(restricted, year)
 
-    for idx, i in enumerate(yt.streams):
-        if i.bitrate == "128kbps":
-            break
-    yt.streams[idx].download()
+    audio_pipe = os.path.join(job_directory, "audio.pipe")
+    pipes = [(audio_stream, audio_pipe, video_stream is None)]
+    if video_stream is None:
+        title = clean_string_regex(os.path.splitext(audio_stream.default_filename)[0])
+        output_file = (ytchannel_path + str(year) + restricted_path + publish_date + " - " + title + " - " + video_id
+                       + "." + audio_format)
+        arguments = ["-i", audio_pipe, "-map", "0:a:0", "-c:a", "copy", *audio_tag_arguments(tags)]
+        print(print_colored_text("\nStreaming AUDIO to " + audio_format.upper() + "...", BCOLORS.BLACK))
+    else:
+        video_pipe = os.path.join(job_directory, "video.pipe")
+        pipes.insert(0, (video_stream, video_pipe, True))
+        title = clean_string_regex(os.path.splitext(video_stream.default_filename)[0])
+        output_file = (ytchannel_path + str(year) + restricted_path + publish_date + " - " + video_resolution + " - "
+                       + title + " - " + video_id + "." + output_container())
+        arguments = ["-i", video_pipe, "-i", audio_pipe, "-map", "0:v:0", "-map", "1:a:0", "-c", "copy"]
+        if output_container() == "mp4":
+            arguments += ["-movflags", "frag_keyframe+empty_moov+default_base_moof"]
+        print(print_colored_text("\nStreaming VIDEO + AUDIO to " + output_container().upper() + "...", BCOLORS.BLACK))
+
+    # Written next to the pipes and moved when complete, an interrupted stream never looks like a finished file
+    streaming_file = os.path.join(job_directory, "streaming" + os.path.splitext(output_file)[1])
+    for _, pipe_path, _ in pipes:
+        if os.path.exists(pipe_path):
+            os.remove(pipe_path)
+        os.mkfifo(pipe_path)
+
+    process = subprocess.Popen(ffmpeg_command(*arguments, streaming_file, show_stats=False))
+    errors = []
+    feeders = [threading.Thread(target=feed_stream_to_pipe, args=(stream, pipe_path, show_progress, errors),
+                                daemon=True) for stream, pipe_path, show_progress in pipes]
+    for feeder in feeders:
+        feeder.start()
+    try:
+        return_code = process.wait()
+    except BaseException:
+        downloads_cancelled.set()
+        process.kill()
+        return_code = process.wait()
+        raise
+    finally:
+        # Unblocks feeders still waiting for ffmpeg to open their pipe
+        for _, pipe_path, _ in pipes:
+            try:
+                os.close(os.open(pipe_path, os.O_RDONLY | os.O_NONBLOCK))
+            except OSError:
+                pass
+        for feeder in feeders:
+            feeder.join()
+        if (errors or return_code != 0) and os.path.exists(streaming_file):
+            os.remove(streaming_file)
+
+    if errors:
+        raise errors[0]
+    if return_code != 0:
+        raise subprocess.CalledProcessError(return_code, "ffmpeg")
+
+    shutil.move(streaming_file, output_file)
+    archive_index_add(output_file)
+    remove_job_directory(job_directory)
+    if video_stream is None:
+        print(print_colored_text("\nAudio downloaded\n", BCOLORS.GREEN))
+    elif restricted:
+        print(print_colored_text("\nRestricted Video downloaded\n", BCOLORS.GREEN))
+    else:
+        print(print_colored_text("\nVideo downloaded\n", BCOLORS.GREEN))
 
-    rename_files_in_temp_directory()
 
+def submit_streams_postprocess(video_id: str, publishing_date: str, res: str, transcode: bool, year: str,
+                               restricted: bool, tags: dict, job_directory: str) -> None:
+    # The ffmpeg stages run while the next video is already downloading (see submit_postprocess)
     if audio_or_video_bool:
-        convert_m4a_to_mp3(yt.video_id, publishing_date, year, restricted)
+        stage = "audio_encode" if transcode else "audio_remux"
+    elif transcode:
+        stage = "transcode"
     else:
-        if more_than1080p:
-            convert_m4a_to_opus_and_merge(yt.video_id, publishing_date, res, year, restricted)
-        else:
-            merge_video_audio(yt.video_id, publishing_date, res, year, restricted)
+        stage = "merge"
+    # Jobs deferred to the transcode_window create no files yet, the channel state is saved here already
+    os.makedirs(ytchannel_path, exist_ok=True)
+    submit_postprocess(postprocess_job(stage, video_id, publishing_date, res, year, restricted, tags, job_directory))
 
 
-def convert_m4a_to_mp3(video_id: str, publish_date: str, year: str, restricted: bool) -> None:
-    video_file, audio_file = find_media_files(".")
+def postprocess_output_directory(job: dict) -> str:
+    restricted_path = "/"
+    if job["restricted"]:
+        restricted_path = "/restricted/"
+    output_directory = job["channel_path"] + str(job["year"]) + restricted_path
+    os.makedirs(output_directory, exist_ok=True)
+    return output_directory
+
+
+def audio_tag_arguments(tags: dict) -> list[str]:
+    arguments = []
+    for tag, value in tags.items():
+        if value:
+            arguments += ["-metadata", f"{tag}={value}"]
+    return arguments
+
+
+def convert_audio(job: dict) -> None:
+    """Stores the audio stream in the audio_format, remuxed as it is (audio_remux) or encoded (audio_encode)."""
+    job_directory = job["job_directory"]
+    # Written next to the stream and moved when done, an interrupted job never looks like a finished file
+    converting_file = os.path.join(job_directory, "converting." + job["audio_format"])
+    if os.path.exists(converting_file):
+        os.remove(converting_file)
+    video_file, audio_file = find_media_files(job_directory)
     if not audio_file:
         print("❌ No M4A files found in the current directory.")
         return
 
-    restricted_path = "/"
-    if restricted:
-        restricted_path = "/restricted/"
-
-    create_directories(restricted, year)
-    output_file = (ytchannel_path + str(year) + restricted_path + publish_date +
-                   " - " + clean_string_regex(os.path.splitext(audio_file)[0]) + " - " + video_id + ".mp3")
-    print(print_colored_text("\nConverting to MP3...", BCOLORS.BLACK))
+    output_file = (postprocess_output_directory(job) + job["publish_date"] + " - "
+                   + clean_string_regex(os.path.splitext(audio_file)[0]) + " - " + job["video_id"] + "."
+                   + job["audio_format"])
+    arguments = ["-i", os.path.join(job_directory, audio_file), "-map", "0:a:0"]
+    if job["stage"] == "audio_encode":
+        print(print_colored_text("\nConverting to " + job["audio_format"].upper() + "...", BCOLORS.BLACK))
+        arguments += [*AUDIO_FORMAT_ENCODERS[job["audio_format"]], "-threads", str(transcode_threads_per_job())]
+    else:
+        arguments += ["-c:a", "copy"]
+    if job["audio_format"] == "m4a":
+        arguments += ["-movflags", "+faststart"]
     try:
-        command = [
-            "ffmpeg", "-loglevel", "quiet", "-stats",
-            "-i", audio_file,  # Input file
-            "-acodec", "libmp3lame",  # Use MP3 codec
-            "-q:a", "2",  # Quality setting (lower is better)
-            output_file
-        ]
+        command = ffmpeg_command(*arguments, *audio_tag_arguments(job.get("tags", {})), converting_file)
+        if job["stage"] == "audio_encode":
+            command = transcode_priority(command)
         subprocess.run(command, check=True)
+        shutil.move(converting_file, output_file)
+        archive_index_add(output_file)
 
     except Exception as ee:
-        print(f"❌ Error merging files: {ee}")
-        sys.exit(1)
+        print(f"❌ Error converting audio: {ee}")
+        raise
 
-    print(print_colored_text("\nMP3 downloaded\n", BCOLORS.GREEN))
-    delete_temp_files()
+    print(print_colored_text("\nAudio downloaded\n", BCOLORS.GREEN))
+    remove_job_directory(job_directory)
 
 
-def merge_video_audio(video_id: str, publish_date: str, video_resolution: str, year: str, restricted: bool) -> None:
-    video_file, audio_file = find_media_files(".")
+def output_container(policy: str | None = None) -> str:
+    if (policy or output_policy) == "mkv":
+        return "mkv"
+    return "mp4"
+
+
+def merge_video_audio(job: dict) -> None:
+    job_directory = job["job_directory"]
+    container = output_container(job["output_policy"])
+    # Merged next to the streams and moved when done, an interrupted merge never looks like a finished video
+    merging_file = os.path.join(job_directory, "merging." + container)
+    if os.path.exists(merging_file):
+        os.remove(merging_file)
+    video_file, audio_file = find_media_files(job_directory)
 
     if not video_file or not audio_file:
         print("❌ No MP4 or M4A files found in the current directory.")
         return
 
-    restricted_path = "/"
-    if restricted:
-        restricted_path = "/restricted/"
+    output_file = (postprocess_output_directory(job) + job["publish_date"] + " - " + job["resolution"]
+                   + " - " + clean_string_regex(os.path.splitext(video_file)[0]) + " - " + job["video_id"] + "."
+                   + container)
 
-    create_directories(restricted, year)
-    output_file = (ytchannel_path + str(year) + restricted_path + publish_date + " - " + video_resolution
-                   + " - " + clean_string_regex(os.path.splitext(video_file)[0]) + " - " + video_id + ".mp4")
+    # The M4A audio stream already is AAC, it is only re-encoded if transcoding is wanted
+    audio_codec = "copy"
+    if job["output_policy"] == "transcode":
+        audio_codec = "aac"
 
     try:
-        print(print_colored_text("\nMerging to MP4...", BCOLORS.BLACK))
-        command = [
-            "ffmpeg", "-loglevel", "quiet", "-stats", "-i", video_file, "-i", audio_file,
-            "-c:v", "copy", "-c:a", "aac", output_file
-        ]
+        print(print_colored_text("\nMerging to " + container.upper() + "...", BCOLORS.BLACK))
+        command = ffmpeg_command(
+            "-i", os.path.join(job_directory, video_file), "-i", os.path.join(job_directory, audio_file),
+            "-c:v", "copy", "-c:a", audio_codec, merging_file
+        )
         subprocess.run(command, check=True)
+        shutil.move(merging_file, output_file)
+        archive_index_add(output_file)
 
-        if restricted:
+        if job["restricted"]:
             print(print_colored_text("\nRestricted Video downloaded\n", BCOLORS.GREEN))
         else:
             print(print_colored_text("\nVideo downloaded\n", BCOLORS.GREEN))
         # remove video and audio streams
-        delete_temp_files()
+        remove_job_directory(job_directory)
 
     except Exception as ee:
         print(f"❌ Error merging files: {ee}")
-        sys.exit(1)
-
-
-def convert_m4a_to_opus_and_merge(video_id: str, publish_date: str, video_resolution: str, year: str,
-                                  restricted: bool) -> None:
-    video_file, audio_file = find_media_files(".")
-    print(print_colored_text("\nConvert M4A audio to Opus format (WebM compatible)...", BCOLORS.BLACK))
-    command = [
-        "ffmpeg", "-loglevel", "quiet", "-stats", "-i", audio_file, "-c:a", "libopus", "audio.opus"
-    ]
-    subprocess.run(command, check=True)
-    merge_webm_opus(video_id, publish_date, video_resolution, year, restricted)
-
-
-def merge_webm_opus(video_id: str, publish_date: str, video_resolution: str, year: str, restricted: bool) -> None:
-    video_file, audio_file = find_media_files(".")
-    output_file = "tmp/" + video_file
-    print(print_colored_text("Merging WebM video with Opus audio...", BCOLORS.BLACK))
-    command = [
-        "ffmpeg", "-loglevel", "quiet", "-stats", "-i", video_file, "-i", "audio.opus",
-        "-c:v", "copy", "-c:a", "copy", output_file
-    ]
-    subprocess.run(command, check=True)
-    # remove video and audio streams
-    delete_temp_files()
-    os.remove("audio.opus")
-    restricted_string = "/"
-    if restricted:
-        restricted_string = "/restricted/"
+        raise
 
-    path = (ytchannel_path + str(year) + restricted_string + publish_date + " - " + video_resolution + " - "
-            + clean_string_regex(os.path.splitext(video_file)[0]) + " - " + video_id + ".mp4")
-    convert_webm_to_mp4(output_file, path, year, restricted)
 
+def convert_webm_to_mp4(job: dict) -> None:
+    """Encodes the WebM video and muxes the AAC audio into the final MP4 in a single ffmpeg pass."""
+    job_directory = job["job_directory"]
+    # Encoded next to the streams and moved when done, an interrupted encode never looks like a finished video
+    encoding_file = os.path.join(job_directory, "encoding.mp4")
+    if os.path.exists(encoding_file):
+        os.remove(encoding_file)
+    video_file, audio_file = find_media_files(job_directory)
 
-def convert_webm_to_mp4(input_file: str, output_file: str, year: str, restricted: bool) -> None:
-    create_directories(restricted, year)
-    print(print_colored_text(f"Converting WebM to MP4... (this may take a while)", BCOLORS.BLACK))
-    command = [
-        "ffmpeg", "-loglevel", "quiet", "-stats", "-i", input_file,
+    if not video_file or not audio_file:
+        print("❌ No WebM or M4A files found in the job directory.")
+        return
+
+    output_file = (postprocess_output_directory(job) + job["publish_date"] + " - " + job["resolution"] + " - "
+                   + clean_string_regex(os.path.splitext(video_file)[0]) + " - " + job["video_id"] + ".mp4")
+
+    print(print_colored_text(f"\nConverting WebM to MP4... (this may take a while)", BCOLORS.BLACK))
+    command = ffmpeg_command(
+        "-i", os.path.join(job_directory, video_file), "-i", os.path.join(job_directory, audio_file),
+        "-map", "0:v:0", "-map", "1:a:0",
         "-c:v", "libx264", "-preset", "fast", "-crf", "23",  # H.264 video encoding
-        "-c:a", "aac", "-b:a", "128k",  # AAC audio encoding
+        "-threads", str(transcode_threads_per_job()),
+        "-c:a", "copy",  # M4A audio already is AAC
         "-movflags", "+faststart",  # Optimize MP4 for streaming
-        output_file
-    ]
-    subprocess.run(command, check=True)
-    os.remove(input_file)
-    if restricted:
+        encoding_file
+    )
+    subprocess.run(transcode_priority(command), check=True)
+    shutil.move(encoding_file, output_file)
+    archive_index_add(output_file)
+    remove_job_directory(job_directory)
+    if job["restricted"]:
         print(print_colored_text("\nRestricted Video downloaded\n", BCOLORS.GREEN))
     else:
         print(print_colored_text("\nVideo downloaded\n", BCOLORS.GREEN))
 
 
+arguments = parse_arguments()
+headless = arguments.sync is not None or arguments.input_file is not None or arguments.process_queue
+sync_targets = deque()
+sync_summary = []
+sync_started = datetime.now()
+postprocess_resumed = False
+if headless:
+    sync_targets.extend(read_sync_targets(arguments.sync, arguments.input_file))
+
 while True:
+    sync_current = None
     try:
         # Load config
         config = load_config("config.json")
@@ -1025,38 +2952,83 @@ while True:
             default_filters_on = config["filters_on_in_channels_list"]
             default_audio_mp3 = config["default_audioMP3"]
             web_client = config["web_client"]
+            metadata_workers = int(config["metadata_workers"])
+            postprocess_queue_size = int(config["postprocess_queue_size"])
+            channel_scan_workers = int(config["channel_scan_workers"])
+            default_output_policy_global = config["output_policy"]
+            download_connections = int(config["download_connections"])
+            download_chunk_size = int(float(config["download_chunk_size_mb"]) * 1024 * 1024)
+            streaming_merge = config["streaming_merge"]
+            bandwidth_limit_mbit = config["bandwidth_limit_mbit"]
+            bandwidth_schedule = config["bandwidth_schedule"]
+            http_connections_per_host = int(config["http_connections_per_host"])
+            http2 = config["http2"]
+            metrics_directory = config["metrics_directory"]
+            metrics_prometheus_file = config["metrics_prometheus_file"]
+            incremental_sync = config["incremental_sync"]
+            full_rescan_days = int(config["full_rescan_days"])
+            stream_codecs = config["stream_codecs"]
+            avoid_transcode = config["avoid_transcode"]
+            default_audio_format_global = config["audio_format"]
+            transcode_cpu_budget = int(config["transcode_cpu_budget"])
+            transcode_threads = int(config["transcode_threads"])
+            transcode_nice = int(config["transcode_nice"])
+            transcode_ionice = config["transcode_ionice"]
+            transcode_window = config["transcode_window"]
+            metadata_cache_ttl = {**REQUIRED_APP_CONFIG["metadata_cache_ttl_hours"], **config["metadata_cache_ttl_hours"]}
         except Exception as e:
             print("An error occurred, incomplete config file:", str(e))
-            cc_check_and_update_json_config("config.json", REQUIRED_APP_CONFIG)
-            continue
+            if cc_check_and_update_json_config("config.json", REQUIRED_APP_CONFIG):
+                continue
+            # Nothing was missing, a value is malformed: reading the file again would fail forever
+            raise ValueError(f"invalid value in config.json: {e}")
 
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
+        http_pool_install(http_connections_per_host, http2)
 
         # Create empty lists
         video_list = []
         video_list_restricted = []
 
-        clear_screen()
+        if headless:
+            video_listing = False
+        else:
+            clear_screen()
         print(print_colored_text("\nYTDL " + str(version), BCOLORS.YELLOW))
         print(print_colored_text("*" * len(str("YTDL " + str(version))), BCOLORS.YELLOW))
         print(print_colored_text("YouTube Channel Downloader (Exit with Ctrl + C)", BCOLORS.BLACK))
         print("")
         delete_temp_files()
+        if not postprocess_resumed:
+            postprocess_resumed = True
+            postprocess_queue_resume()
+        cleanup_job_directories()
         print_configuration()
 
-        lines = read_channel_txt_lines("channels.txt")
-        if lines and len(lines) > 1:
-            YTchannel = user_selection(lines, show_latest_video_date)
+        if headless:
+            if not sync_targets:
+                if arguments.process_queue:
+                    wait_for_postprocess(deferred=True)
+                break
+            sync_current = {"target": sync_targets.popleft(), "status": "running"}
+            YTchannel = sync_current["target"]
+            print(print_colored_text(f"Sync {len(sync_summary) + 1}/{len(sync_summary) + len(sync_targets) + 1}: "
+                                     + YTchannel, BCOLORS.CYAN))
         else:
-            YTchannel = input("\nYouTube Channel, Video-, or Playlist URL:  ")
-        if "- Enter YouTube Channel or Video URL -" in YTchannel:
-            YTchannel = input("\nYouTube Channel, Video-, or Playlist URL:  ")
+            lines = read_channel_txt_lines("channels.txt")
+            if lines and len(lines) > 1:
+                YTchannel = user_selection(lines, show_latest_video_date)
+            else:
+                YTchannel = input("\nYouTube Channel, Video-, or Playlist URL:  ")
+            if "- Enter YouTube Channel or Video URL -" in YTchannel:
+                YTchannel = input("\nYouTube Channel, Video-, or Playlist URL:  ")
 
         print("")
         print_asteriks_line()
 
         video_id_from_single_video = ""
+        sync_playlist = None
         if youtube_watch_url in YTchannel:
             if web_client:
                 ytv = YouTube(YTchannel, 'WEB')
@@ -1072,19 +3044,17 @@ while True:
             YTchannel = ytv.channel_url
             video_id_from_single_video = ytv.video_id
         elif "list=" in YTchannel:
+            # The video ids come from the playlist listing later on, the owner channel gives directory and config
             if web_client:
-                playlist = Playlist(YTchannel, 'WEB')
+                sync_playlist = ListingPlaylist(YTchannel, 'WEB')
             else:
-                playlist = Playlist(YTchannel)
-            YTchannel = playlist.owner_url
-            for p_video in playlist.videos:
-                video_id_from_single_video += p_video.video_id + ","
-            video_id_from_single_video = video_id_from_single_video[:-1]
+                sync_playlist = ListingPlaylist(YTchannel)
+            YTchannel = sync_playlist.owner_url
 
         if web_client:
-            channelYT = Channel(YTchannel, 'WEB')
+            channelYT = ListingChannel(YTchannel, 'WEB')
         else:
-            channelYT = Channel(YTchannel)
+            channelYT = ListingChannel(YTchannel)
         channelYT_name = channelYT.channel_name
         channelYT_url = channelYT.channel_url
         channelYT_video_urls = channelYT.video_urls
@@ -1155,6 +3125,8 @@ while True:
         default_exclude_videos = ""
         default_include_videos = ""
         default_filter_words = ""
+        default_output_policy = default_output_policy_global
+        default_audio_format = default_audio_format_global
 
         if os.path.exists(ytchannel_path + channel_config_path):
             incomplete_config = False
@@ -1246,6 +3218,20 @@ while True:
                 incomplete_config = True
                 incomplete_string.append("c_filter_words")
 
+            if "c_output_policy" in channel_config:
+                if channel_config["c_output_policy"] != "":
+                    default_output_policy = channel_config["c_output_policy"]
+            else:
+                incomplete_config = True
+                incomplete_string.append("c_output_policy")
+
+            if "c_audio_format" in channel_config:
+                if channel_config["c_audio_format"] != "":
+                    default_audio_format = channel_config["c_audio_format"]
+            else:
+                incomplete_config = True
+                incomplete_string.append("c_audio_format")
+
             if incomplete_config:
                 print(print_colored_text("\nIncomplete ", BCOLORS.DARK_YELLOW)
                       + print_colored_text("channel config file! --> Adding missing key(s) to file ", BCOLORS.BLUE)
@@ -1257,6 +3243,8 @@ while True:
 
         if video_id_from_single_video != "":
             default_include_videos = video_id_from_single_video
+        elif sync_playlist is not None:
+            default_include_videos = ""
 
         default_value_mp3 = "v"
         if default_audio_mp3:
@@ -1267,10 +3255,18 @@ while True:
         if audio_or_video == "v":
             audio_or_video_bool = False
 
+        audio_format = default_audio_format
         if audio_or_video_bool:
             limit_resolution_to = "max"
+            output_policy = default_output_policy
+            audio_format = smart_input("Audio format (" + "/".join(AUDIO_FORMAT_CODECS) + "):", default_audio_format)
+            if audio_format not in AUDIO_FORMAT_CODECS:
+                audio_format = list(AUDIO_FORMAT_CODECS)[0]
         else:
             limit_resolution_to = smart_input("Max. Resolution:  ", default_max_res)
+            output_policy = smart_input("Output (" + "/".join(OUTPUT_POLICIES) + "):", default_output_policy)
+            if output_policy not in OUTPUT_POLICIES:
+                output_policy = OUTPUT_POLICIES[0]
 
         min_duration = smart_input("Minimum duration in minutes (0=disabled):", default_min_duration_in_minutes)
         min_duration_bool = False
@@ -1351,83 +3347,189 @@ while True:
         count_skipped = 0
 
         video_watch_urls = []
+        video_filter = VideoFilter(video_name_filter, min_duration, max_duration, min_year, max_year,
+                                   min_video_views, only_restricted_videos_bool, skip_restricted_bool, exclude_list)
+        metrics_channel = channelYT_name
+        archive_index = archive_index_load(ytchannel_path)
+        metadata_cache = metadata_cache_load(ytchannel_path)
+        rejection_cache = rejection_cache_load(ytchannel_path)
+        with video_sessions_lock:
+            video_sessions.clear()
+        rejection_signature = video_filter.signature()
+        count_metadata_lookups = 0
+
+        # With unchanged filters the listing (newest first) is only read up to the newest video of the last sync
+        sync_state = cc_load_config(ytchannel_path + sync_state_path)
+        filter_signature = video_filter.signature(limit_resolution_to, audio_or_video_bool)
+        watermark_id = None
+        if (sync_state_current(sync_state) and sync_state.get("filter") == filter_signature
+                and sync_state.get("video_id")):
+            watermark_id = sync_state["video_id"]
+        sync_pending = []
+        listing_video_ids = []
+        listing_data = channelYT.listing
+        playlist_state = None
+        playlist_handled = set()
+        video_pending = set()
+        postprocess_failures_before = postprocess_failures
 
         if len(include_list) > 0:
             for include in include_list:
                 video_watch_urls.append(youtube_watch_url + include)
-        else:
+        elif sync_playlist is not None:
+            # Playlists have their own state: the cached listing and the videos handled by earlier syncs
             print()
-            for url in channelYT_video_urls:
+            playlist_states = cc_load_config(ytchannel_path + playlist_state_path)
+            playlist_state = playlist_states.get(sync_playlist.playlist_id, {})
+            playlist_current = sync_state_current(playlist_state)
+            with metrics_stage("listing", playlist=sync_playlist.playlist_id) as listing_event:
+                playlist_video_ids, playlist_cached = playlist_listing(sync_playlist, playlist_state,
+                                                                       playlist_current)
+                listing_event.update({"videos": len(playlist_video_ids), "cached": playlist_cached})
+            if playlist_current and playlist_state.get("filter") == filter_signature:
+                playlist_handled = set(playlist_state.get("handled", []))
+            listing_data = sync_playlist.listing
+            for playlist_video_id in playlist_video_ids:
                 count_total_videos += 1
-                if url.video_id not in exclude_list:
-                    if len(include_list) > 0:
-                        if url.video_id in include_list:
-                            video_watch_urls.append(url.watch_url)
-                    # else:
-                    video_watch_urls.append(url.watch_url)
-                print(f"\rFetching " + str(count_total_videos) + " videos", end="", flush=True)
-            print(f"\rTotal {count_total_videos} Video(s) by: \033[96m{channelYT_name}\033[0m", end="", flush=True)
+                if playlist_video_id not in playlist_handled and not video_filter.excludes(playlist_video_id):
+                    video_watch_urls.append(youtube_watch_url + playlist_video_id)
+            print(f"Total {count_total_videos} Video(s) in playlist: \033[96m{sync_playlist.title}\033[0m", end="")
+            if playlist_handled:
+                print(f", {count_total_videos - len(playlist_handled & set(playlist_video_ids))} not synced yet",
+                      end="")
+            print("\n")
+        else:
+            print()
+            with metrics_stage("listing", incremental=watermark_id is not None) as listing_event:
+                for url in (channelYT_video_urls if watermark_id is None else channelYT.videos_since(watermark_id)):
+                    count_total_videos += 1
+                    listing_video_ids.append(url.video_id)
+                    if not video_filter.excludes(url.video_id):
+                        video_watch_urls.append(url.watch_url)
+                    print(f"\rFetching " + str(count_total_videos) + " videos", end="", flush=True)
+                listing_event["videos"] = count_total_videos
+            # Pending videos of earlier syncs are below the watermark, they are looked at again on their own
+            if watermark_id is not None:
+                sync_pending = sync_state.get("pending", [])
+            for pending_video_id in sync_pending:
+                if pending_video_id not in listing_video_ids and not video_filter.excludes(pending_video_id):
+                    video_watch_urls.append(youtube_watch_url + pending_video_id)
+            if watermark_id is None:
+                print(f"\rTotal {count_total_videos} Video(s) by: \033[96m{channelYT_name}\033[0m", end="", flush=True)
+            else:
+                print(f"\r{count_total_videos} new Video(s) since the last sync by: \033[96m{channelYT_name}\033[0m",
+                      end="", flush=True)
+                if sync_pending:
+                    print(f", {len(sync_pending)} pending Video(s) checked again", end="", flush=True)
             print("\n")
 
-        for url in video_watch_urls:
-            only_video_id = pytubefix.extract.video_id(url)
-            if find_file_by_string(ytchannel_path, only_video_id, limit_resolution_to, audio_or_video_bool) is not None:
+        # Skip decisions are made up front so the metadata of the remaining videos can be prefetched in order
+        video_watch_ids = list(dict.fromkeys(pytubefix.extract.video_id(url) for url in video_watch_urls))
+        video_watch_skipped = [archive_index_find(archive_index, only_video_id, limit_resolution_to,
+                                                  audio_or_video_bool) is not None for only_video_id in video_watch_ids]
+        # Videos the channel listing or an earlier rejection already rule out never need a player request
+        with metrics_stage("prefilter") as prefilter_event:
+            video_watch_prefiltered = [
+                None if skipped else (
+                        video_filter.listing_check(listing_data.get(only_video_id)) or
+                        rejection_cache_check(rejection_cache, video_filter, rejection_signature, only_video_id))
+                for only_video_id, skipped in zip(video_watch_ids, video_watch_skipped)]
+            count_prefiltered = len(video_watch_prefiltered) - video_watch_prefiltered.count(None)
+            prefilter_event["videos"] = len(video_watch_ids)
+            prefilter_event["rejected"] = count_prefiltered
+        if count_prefiltered:
+            print(print_colored_text(f"{count_prefiltered} Video(s) filtered by the channel listing or earlier "
+                                     f"rejections", BCOLORS.MAGENTA))
+        video_metadata_iter = prefetch_video_metadata(
+            metadata_cache, [only_video_id for only_video_id, skipped, prefiltered
+                             in zip(video_watch_ids, video_watch_skipped, video_watch_prefiltered)
+                             if not skipped and not prefiltered], metadata_workers)
+
+        for only_video_id, skipped, prefiltered in zip(video_watch_ids, video_watch_skipped, video_watch_prefiltered):
+            if skipped:
                 count_ok_videos += 1
                 count_skipped += 1
                 print(print_colored_text(f"\rSkipping {count_skipped} Videos", BCOLORS.MAGENTA), end="", flush=True)
+            elif prefiltered:
+                if prefiltered == "pending":
+                    video_pending.add(only_video_id)
             else:
-                do_not_download = 0
-                if web_client:
-                    video = YouTube(youtube_watch_url + only_video_id, 'WEB', on_progress_callback=on_progress)
+                video = next(video_metadata_iter)
+                count_metadata_lookups += 1
+                if count_metadata_lookups % 25 == 0:
+                    metadata_cache_save(ytchannel_path, metadata_cache)
+                    rejection_cache_save(ytchannel_path, rejection_cache)
+                filter_started = time.time()
+                filter_outcome = video_filter.check(video)
+                metrics_record({"stage": "filter", "video_id": video.video_id, "outcome": filter_outcome},
+                               filter_started)
+                if filter_outcome in ("rejected", "pending"):
+                    rejection_cache_add(rejection_cache, video, video_filter.rejection_reason(video),
+                                        rejection_signature)
                 else:
-                    video = YouTube(youtube_watch_url + only_video_id, on_progress_callback=on_progress)
-                if video_name_filter == "" or any(
-                        word.lower() in video.title.lower() for word in video_name_filter_list):
-                    if min_duration_bool:
-                        video_duration = int(video.length / 60)
-                        if video_duration <= int(min_duration):
-                            do_not_download = 1
-                    if max_duration_bool and max_duration > min_duration:
-                        video_duration = int(video.length / 60)
-                        if video_duration >= int(max_duration):
-                            do_not_download = 1
-                    if int(min_year) > 0:
-                        if int(video.publish_date.strftime("%Y")) <= int(min_year):
-                            do_not_download = 1
-                            break
-                    if int(max_year) > 0:
-                        if int(video.publish_date.strftime("%Y")) >= int(max_year):
-                            do_not_download = 1
-                    if min_video_views > 0:
-                        if video.views <= min_video_views:
-                            do_not_download = 1
-                    if (not video.age_restricted and
-                            video.vid_info.get('playabilityStatus', {}).get('status') != 'UNPLAYABLE' and
-                            video.vid_info.get('playabilityStatus', {}).get('status') != 'LIVE_STREAM_OFFLINE' and
-                            do_not_download == 0 and not only_restricted_videos_bool):
-                        count_ok_videos += 1
-                        count_this_run += 1
-                        count_skipped = 0
-                        video_list.append(video.video_id)
-                        download_video(clean_string_regex(channelYT_name).rstrip(), video.video_id,
-                                       count_ok_videos, len(video_watch_urls), video.views, False)
-                    else:
-                        if not skip_restricted_bool:
-                            if (video.age_restricted and video.vid_info.get('playabilityStatus', {}).get('status') != 'UNPLAYABLE' and
-                                    video.vid_info.get('playabilityStatus', {}).get('status') != 'LIVE_STREAM_OFFLINE' and
-                                    do_not_download == 0):
-                                count_restricted_videos += 1
-                                count_ok_videos += 1
-                                count_this_run += 1
-                                video_list_restricted.append(video.video_id)
-                                download_video(clean_string_regex(channelYT_name).rstrip(), video.video_id,
-                                               count_ok_videos, len(video_watch_urls), video.views, True)
+                    rejection_cache_discard(rejection_cache, video.video_id)
+                if filter_outcome == "pending":
+                    video_pending.add(video.video_id)
+                elif filter_outcome == "accepted":
+                    count_ok_videos += 1
+                    count_this_run += 1
+                    count_skipped = 0
+                    video_list.append(video.video_id)
+                    download_video(clean_string_regex(channelYT_name).rstrip(), video.video_id,
+                                   count_ok_videos, len(video_watch_ids), video.views, False, video.publish_date)
+                elif filter_outcome == "accepted_restricted":
+                    count_restricted_videos += 1
+                    count_ok_videos += 1
+                    count_this_run += 1
+                    video_list_restricted.append(video.video_id)
+                    download_video(clean_string_regex(channelYT_name).rstrip(), video.video_id,
+                                   count_ok_videos, len(video_watch_ids), video.views, True, video.publish_date)
+                video_session_close(video.video_id)
+
+        video_metadata_iter.close()
+        wait_for_postprocess()
+        metadata_cache_save(ytchannel_path, metadata_cache)
+        rejection_cache_save(ytchannel_path, rejection_cache)
+        if (listing_video_ids or sync_pending) and postprocess_failures == postprocess_failures_before:
+            sync_state_save(ytchannel_path, sync_state, listing_video_ids,
+                            [only_video_id for only_video_id in video_watch_ids if only_video_id in video_pending],
+                            watermark_id, filter_signature, metadata_cache)
+        if playlist_state is not None and postprocess_failures == postprocess_failures_before:
+            playlist_state_save(ytchannel_path, playlist_states, sync_playlist.playlist_id, playlist_state,
+                                video_pending, not playlist_cached and not playlist_handled, filter_signature)
 
         if count_this_run == 0:
             print("\n\n" + print_colored_text("Nothing to do...\n\n", BCOLORS.GREEN))
         else:
             print(print_colored_text(f"\nDONE! Downloaded in this session: {count_this_run}", BCOLORS.GREEN))
             print(f"\n{get_free_space(ytchannel_path)} free\n")
+        print_http_pool_stats()
+        metrics_write_prometheus()
+        if sync_current is not None:
+            # Videos whose merge/conversion failed are not downloaded, their streams wait for the next run
+            postprocess_failed = [only_video_id for only_video_id in video_list + video_list_restricted
+                                  if only_video_id in postprocess_failed_videos]
+            unusable_streams = [only_video_id for only_video_id in video_list + video_list_restricted
+                                if only_video_id in unusable_stream_videos]
+            sync_current.update({
+                "status": "ok" if postprocess_failures == postprocess_failures_before else "error",
+                "channel": channelYT_name,
+                "path": ytchannel_path,
+                "videos": len(video_watch_ids),
+                "skipped": sum(video_watch_skipped),
+                "prefiltered": count_prefiltered,
+                "incremental": watermark_id is not None or bool(playlist_handled),
+                "downloaded": count_this_run - len(postprocess_failed) - len(unusable_streams),
+                "unusable_streams": unusable_streams,
+                "restricted": count_restricted_videos,
+                "http": http_pool_snapshot()
+            })
+            if postprocess_failures != postprocess_failures_before:
+                sync_current.update({
+                    "error": f"post processing failed ({postprocess_failures - postprocess_failures_before} job(s))",
+                    "postprocess_failed": postprocess_failed
+                })
+            sync_summary.append(sync_current)
         continue_ytdl = smart_input("Continue?  Y/n ", "y")
         print("\n")
         if continue_ytdl == "y":
@@ -1437,7 +3539,15 @@ while True:
 
     except Exception as e:
         delete_temp_files()
+        cleanup_job_directories()
         print("An error occurred:", str(e))
+        if headless:
+            if sync_current is None:
+                # Not caused by a target (e.g. missing config.json), retrying would fail forever
+                sync_summary.append({"target": None, "status": "error", "error": str(e)})
+                break
+            sync_current.update({"status": "error", "error": str(e)})
+            sync_summary.append(sync_current)
         continue_ytdl = smart_input("There was an exception. Continue?  Y/n ", "y")
         print("\n")
         if continue_ytdl == "y":
@@ -1447,9 +3557,19 @@ while True:
 
     except KeyboardInterrupt:
         delete_temp_files()
+        cleanup_job_directories()
+        if headless:
+            if sync_current is not None:
+                sync_current["status"] = "interrupted"
+                sync_summary.append(sync_current)
+            break
         continue_ytdl = smart_input("\n\nCtrl + C detected. Continue?  Y/n ", "y")
         print("\n")
         if continue_ytdl == "y":
             continue
         else:
             break
+
+metrics_write_prometheus()
+if headless:
+    sys.exit(write_sync_summary(sync_summary, sync_started, arguments.summary))
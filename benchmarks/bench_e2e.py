@@ -0,0 +1,183 @@
+"""End-to-end throughput benchmark: runs YTDL.py --sync against the local fake YouTube server.
+
+Everything runs offline, the only requirement besides YTDL's own dependencies is ffmpeg. The time per stage comes
+from YTDL's own stage metrics (metrics_directory), the request side from the fake server. Example:
+
+    python benchmarks/bench_e2e.py --videos 40 --latency-ms 50 --mode remux --runs 2
+
+The first run downloads the whole channel, later runs measure the incremental (nothing new) sync.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from fake_youtube import FakeYouTube
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MEDIA_EXTENSIONS = (".mp4", ".mkv", ".mp3", ".m4a", ".opus")
+AUDIO_MODES = ("mp3", "m4a", "opus")
+# fake server request category -> description
+REQUEST_CATEGORIES = {"listing": "channel listing", "player": "player responses", "watch": "watch pages",
+                      "stream": "streams"}
+
+
+def write_config(work_directory: str, mode: str, overrides: dict) -> str:
+    with open(os.path.join(REPOSITORY_DIRECTORY, "config.example.json"), "r", encoding="utf-8") as file:
+        config = json.load(file)
+    output_directory = os.path.join(work_directory, "output")
+    config.update({
+        "output_directory": output_directory,
+        "video_listing": False,
+        "web_client": False,  # the WEB client needs YouTube's player JS, the fake server has none
+        "default_audioMP3": mode in AUDIO_MODES,
+        "audio_format": mode if mode in AUDIO_MODES else "m4a",
+        "output_policy": mode if mode in ("remux", "mkv", "transcode") else "remux",
+        "metrics_directory": os.path.join(work_directory, "metrics")
+    })
+    config.update(overrides)
+    with open(os.path.join(work_directory, "config.json"), "w", encoding="utf-8") as file:
+        json.dump(config, file, indent=4)
+    return output_directory
+
+
+def count_media_files(directory: str) -> tuple[int, int]:
+    count, size = 0, 0
+    for root, _, files in os.walk(directory):
+        for file in files:
+            if file.endswith(MEDIA_EXTENSIONS):
+                count += 1
+                size += os.path.getsize(os.path.join(root, file))
+    return count, size
+
+
+def read_stage_metrics(metrics_directory: str, known_files: set) -> dict:
+    """Sums up the stage events YTDL wrote (metrics_directory) during the last run."""
+    stages = {}
+    if not os.path.isdir(metrics_directory):
+        return stages
+    for file_name in sorted(set(os.listdir(metrics_directory)) - known_files):
+        known_files.add(file_name)
+        with open(os.path.join(metrics_directory, file_name), "r", encoding="utf-8") as file:
+            for line in file:
+                event = json.loads(line)
+                stage = stages.setdefault(event["stage"], {"events": 0, "seconds": 0.0, "bytes": 0, "outcomes": {}})
+                stage["events"] += 1
+                stage["seconds"] += event["duration"]
+                stage["bytes"] += event.get("bytes") or 0
+                stage["outcomes"][event["outcome"]] = stage["outcomes"].get(event["outcome"], 0) + 1
+    return stages
+
+
+def run_ytdl(work_directory: str, base_url: str, log_file) -> tuple[float, dict]:
+    environment = {name: value for name, value in os.environ.items() if not name.lower().endswith("_proxy")}
+    summary_file = os.path.join(work_directory, "summary.json")
+    started = time.time()
+    subprocess.run([sys.executable, os.path.join(REPOSITORY_DIRECTORY, "benchmarks", "ytdl_local.py"), base_url,
+                    "--sync", "--summary", summary_file], cwd=work_directory, env=environment,
+                   stdin=subprocess.DEVNULL, stdout=log_file, stderr=subprocess.STDOUT)
+    wall_time = time.time() - started
+    with open(summary_file, "r", encoding="utf-8") as file:
+        return wall_time, json.load(file)
+
+
+def report(run: int, wall_time: float, summary: dict, stats: dict, stages: dict, media_files: int,
+           media_bytes: int) -> dict:
+    downloaded = summary["downloaded"]
+    stream_bytes = stats.get("stream", {}).get("bytes", 0)
+    requests = {}
+    for category, description in REQUEST_CATEGORIES.items():
+        if category in stats:
+            requests[description] = {"requests": stats[category]["requests"],
+                                     "server_seconds": round(stats[category]["seconds"], 3),
+                                     "span_seconds": round(stats[category]["last"] - stats[category]["first"], 3),
+                                     "bytes": stats[category]["bytes"]}
+    result = {
+        "run": run,
+        "wall_seconds": round(wall_time, 3),
+        "failed_targets": summary["failed"],
+        "downloaded": downloaded,
+        "videos_per_minute": round(downloaded / wall_time * 60, 2) if wall_time else 0,
+        "stream_bytes_per_second": round(stream_bytes / wall_time) if wall_time else 0,
+        "output_files": media_files,
+        "output_bytes": media_bytes,
+        "stages": stages,
+        "requests": requests
+    }
+    print(f"\nRun {run}: {downloaded} videos in {wall_time:.2f} s, {result['videos_per_minute']} videos/min, "
+          f"{stream_bytes / wall_time / 1024 / 1024:.2f} MB/s streamed, failed targets: {summary['failed']}")
+    print(f"  {'stage':<24}{'events':>10}{'total s':>12}{'avg s':>10}{'MB':>10}  outcomes")
+    for stage, values in stages.items():
+        print(f"  {stage:<24}{values['events']:>10}{values['seconds']:>12.3f}"
+              f"{values['seconds'] / values['events']:>10.3f}{values['bytes'] / 1024 / 1024:>10.2f}  "
+              + ", ".join(f"{outcome} {count}" for outcome, count in values["outcomes"].items()))
+    print(f"  {'fake server':<24}{'requests':>10}{'server s':>12}{'span s':>10}{'MB':>10}")
+    for description, values in requests.items():
+        print(f"  {description:<24}{values['requests']:>10}{values['server_seconds']:>12.3f}"
+              f"{values['span_seconds']:>10.3f}{values['bytes'] / 1024 / 1024:>10.2f}")
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="YTDL end-to-end benchmark against a local fake YouTube")
+    parser.add_argument("--videos", type=int, default=20, help="videos in the fake channel")
+    parser.add_argument("--duration", type=int, default=5, help="length of the generated clips in seconds")
+    parser.add_argument("--latency-ms", type=float, default=0, help="latency added to every response")
+    parser.add_argument("--stream-mbit", type=float, default=0, help="stream speed per connection, 0 = unlimited")
+    parser.add_argument("--mode", default="remux", choices=["remux", "mkv", "transcode", *AUDIO_MODES],
+                        help="transcode serves 2160p streams and re-encodes them")
+    parser.add_argument("--runs", type=int, default=1, help="runs on the same output directory")
+    parser.add_argument("--playlist", action="store_true", help="sync the playlist of all channel videos instead")
+    parser.add_argument("--config", default="{}", help="JSON object merged into config.json, "
+                                                     "e.g. '{\"download_connections\": 8}'")
+    parser.add_argument("--results", help="append the results as one JSON line to this file")
+    parser.add_argument("--keep", action="store_true", help="keep the working directory")
+    arguments = parser.parse_args()
+
+    if shutil.which("ffmpeg") is None:
+        print("ffmpeg is required for the end-to-end benchmark")
+        return 2
+
+    media_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".media")
+    max_resolution = "2160p" if arguments.mode == "transcode" else "1080p"
+    fake_youtube = FakeYouTube(media_directory, arguments.videos, arguments.duration, arguments.latency_ms,
+                               arguments.stream_mbit, max_resolution)
+    base_url = fake_youtube.start()
+    work_directory = tempfile.mkdtemp(prefix="ytdl_bench_")
+    output_directory = write_config(work_directory, arguments.mode, json.loads(arguments.config))
+    with open(os.path.join(work_directory, "channels.txt"), "w", encoding="utf-8") as file:
+        file.write((fake_youtube.playlist_url if arguments.playlist else fake_youtube.channel_url) + "\n")
+    print(f"Fake YouTube on {base_url}: {arguments.videos} videos x {arguments.duration} s "
+          f"({', '.join(fake_youtube.resolutions)}), latency {arguments.latency_ms} ms, mode {arguments.mode}")
+    print(f"Working directory: {work_directory}")
+
+    results = []
+    metrics_files = set()
+    try:
+        with open(os.path.join(work_directory, "ytdl.log"), "w", encoding="utf-8") as log_file:
+            for run in range(1, arguments.runs + 1):
+                fake_youtube.reset()
+                wall_time, summary = run_ytdl(work_directory, base_url, log_file)
+                media_files, media_bytes = count_media_files(output_directory)
+                stages = read_stage_metrics(os.path.join(work_directory, "metrics"), metrics_files)
+                results.append(report(run, wall_time, summary, fake_youtube.snapshot(), stages, media_files,
+                                      media_bytes))
+    finally:
+        fake_youtube.stop()
+        if not arguments.keep:
+            shutil.rmtree(work_directory, ignore_errors=True)
+
+    if arguments.results:
+        with open(arguments.results, "a", encoding="utf-8") as file:
+            file.write(json.dumps({"date": datetime.now().isoformat(timespec="seconds"),
+                                   "parameters": vars(arguments), "runs": results}) + "\n")
+    return 1 if any(result["failed_targets"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
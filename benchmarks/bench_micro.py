@@ -0,0 +1,269 @@
+"""Micro-benchmarks of YTDL's pure-Python hot paths on synthetic archives of realistic size.
+
+Covers the skip check (find_file_by_string vs. the archive index), exclude/include list handling, title filter
+matching (any/in vs. the compiled VideoFilter), print_resolutions, select_streams and organize_files_by_year. Example:
+
+    python benchmarks/bench_micro.py --files 100000 --results benchmarks/micro_results.jsonl
+
+Every run is compared with the last result of the same parameters in the results file, slower timings are flagged.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import types
+from datetime import date, datetime, timedelta
+
+from pytubefix import Stream, StreamQuery
+from pytubefix.extract import apply_descrambler
+from pytubefix.monostate import Monostate
+
+from ytdl_loader import load_ytdl
+
+YOUTUBE_WATCH_URL = "https://www.youtube.com/watch?v="
+ID_CHARACTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+TITLE_WORDS = ["live", "review", "unboxing", "tutorial", "vlog", "music", "official", "trailer", "episode", "part",
+               "highlights", "interview", "behind", "scenes", "reaction", "update", "news", "guide", "setup", "test"]
+# resolution -> (vp9 itag, avc1 itag, width, height) of the video formats YouTube usually offers
+STREAM_FORMATS = {"2160p": (313, 401, 3840, 2160), "1440p": (271, 400, 2560, 1440), "1080p": (248, 137, 1920, 1080),
+                  "720p": (247, 136, 1280, 720), "480p": (244, 135, 854, 480), "360p": (243, 134, 640, 360),
+                  "240p": (242, 133, 426, 240), "144p": (278, 160, 256, 144)}
+REGRESSION_THRESHOLD = 1.25
+
+
+def find_file_by_string(directory: str, search_string: str, resolution: str, mp3: bool) -> str | None:
+    """The skip check YTDL used before the archive index: a full os.walk of the channel directory per video."""
+    if resolution == "max":
+        resolution = ""
+    if mp3:
+        resolution = "mp3"
+    if not os.path.exists(directory):
+        return None
+    for root, _, files in os.walk(directory):
+        for filename in files:
+            if search_string in filename and resolution in filename:
+                return os.path.join(root, filename)
+    return None
+
+
+def random_video_id(generator: random.Random) -> str:
+    return "".join(generator.choice(ID_CHARACTERS) for _ in range(11))
+
+
+def random_title(generator: random.Random) -> str:
+    return " ".join(generator.choice(TITLE_WORDS).capitalize() for _ in range(generator.randint(3, 9)))
+
+
+def synthetic_videos(count: int, seed: int) -> list[dict]:
+    generator = random.Random(seed)
+    newest = date(2025, 3, 1)
+    return [{"video_id": random_video_id(generator),
+             "title": random_title(generator),
+             "publish_date": newest - timedelta(days=generator.randint(0, 15 * 365)),
+             "resolution": generator.choice(["2160p", "1440p", "1080p", "720p"]),
+             "restricted": generator.random() < 0.05,
+             "mp3": generator.random() < 0.1}
+            for _ in range(count)]
+
+
+def archive_file_name(video: dict) -> str:
+    if video["mp3"]:
+        return f"{video['publish_date']:%Y-%m-%d} - {video['title']} - {video['video_id']}.mp3"
+    return f"{video['publish_date']:%Y-%m-%d} - {video['resolution']} - {video['title']} - {video['video_id']}.mp4"
+
+
+def build_channel_tree(directory: str, videos: list[dict], year_subfolders: bool) -> None:
+    """Creates (empty) archive files the way YTDL lays them out: [YYYY/][restricted/]<file name>."""
+    for video in videos:
+        folder = directory
+        if year_subfolders:
+            folder = os.path.join(folder, str(video["publish_date"].year))
+        if video["restricted"]:
+            folder = os.path.join(folder, "restricted")
+        os.makedirs(folder, exist_ok=True)
+        open(os.path.join(folder, archive_file_name(video)), "wb").close()
+
+
+def synthetic_youtube(generator: random.Random) -> types.SimpleNamespace:
+    """Object with the streams attribute of a pytubefix YouTube, built from a synthetic streamingData."""
+    max_resolution = generator.choice(["2160p", "1440p", "1080p", "720p"])
+    formats = []
+    for resolution, (webm_itag, mp4_itag, width, height) in list(STREAM_FORMATS.items())[
+                                                                 list(STREAM_FORMATS).index(max_resolution):]:
+        mp4_codec = "av01.0.12M.08" if height > 1080 else "avc1.640028"  # no H.264 above 1080p
+        for itag, mime_type in ((mp4_itag, f'video/mp4; codecs="{mp4_codec}"'),
+                                (webm_itag, 'video/webm; codecs="vp9"')):
+            formats.append({"itag": itag, "url": f"https://example.invalid/videoplayback?itag={itag}",
+                            "mimeType": mime_type, "bitrate": width * height, "width": width, "height": height,
+                            "contentLength": str(width * height * 10), "qualityLabel": resolution, "fps": 30,
+                            "approxDurationMs": "600000", "lastModified": "1700000000000000"})
+    for itag, mime_type in ((140, 'audio/mp4; codecs="mp4a.40.2"'), (251, 'audio/webm; codecs="opus"')):
+        formats.append({"itag": itag, "url": f"https://example.invalid/videoplayback?itag={itag}",
+                        "mimeType": mime_type, "bitrate": 130000, "contentLength": "9600000",
+                        "approxDurationMs": "600000", "lastModified": "1700000000000000"})
+    monostate = Monostate(on_progress=None, on_complete=None)
+    streams = [Stream(stream, monostate) for stream in apply_descrambler({"adaptiveFormats": formats})]
+    return types.SimpleNamespace(streams=StreamQuery(streams))
+
+
+def measure(function, repeat: int, number: int = 1) -> float:
+    """Best wall time in seconds of one call, out of repeat samples of number calls (like timeit)."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - started) / number)
+    return min(timings)
+
+
+def run_benchmarks(ytdl, work_directory: str, arguments) -> dict:
+    generator = random.Random(arguments.seed)
+    videos = synthetic_videos(arguments.files, arguments.seed)
+    channel_directory = os.path.join(work_directory, "channel")
+    build_channel_tree(channel_directory, videos, year_subfolders=True)
+    # Half of the lookups hit an archived video, the others are new videos (a full walk for find_file_by_string)
+    lookups = ([video["video_id"] for video in generator.sample(videos, arguments.lookups // 2)] +
+               [random_video_id(generator) for _ in range(arguments.lookups - arguments.lookups // 2)])
+    results = {}
+
+    def skip_check_walk() -> None:
+        for video_id in lookups:
+            find_file_by_string(channel_directory, video_id, "max", False)
+    results["skip_check.find_file_by_string"] = measure(skip_check_walk, arguments.repeat) / len(lookups)
+
+    index_file = channel_directory + ytdl.archive_index_path
+
+    def index_cold() -> None:
+        if os.path.exists(index_file):
+            os.remove(index_file)
+        ytdl.archive_index_load(channel_directory)
+    results["skip_check.archive_index_load_cold"] = measure(index_cold, arguments.repeat)
+    ytdl.archive_index_load(channel_directory)
+    results["skip_check.archive_index_load_warm"] = measure(lambda: ytdl.archive_index_load(channel_directory),
+                                                            arguments.repeat)
+    index = ytdl.archive_index_load(channel_directory)
+
+    def skip_check_index() -> None:
+        for video_id in lookups:
+            ytdl.archive_index_find(index, video_id, "max", False)
+    results["skip_check.archive_index_find"] = measure(skip_check_index, arguments.repeat, 100) / len(lookups)
+
+    # Exclude list from the channel config, checked for every video of the channel
+    exclude_string = ",".join(YOUTUBE_WATCH_URL + video["video_id"] if number % 2 else video["video_id"]
+                              for number, video in enumerate(generator.sample(videos, arguments.exclude)))
+    results["exclude.clean_youtube_urls_string_to_list"] = measure(
+        lambda: ytdl.clean_youtube_urls(ytdl.string_to_list(exclude_string)), arguments.repeat, 20)
+    exclude_list = ytdl.clean_youtube_urls(ytdl.string_to_list(exclude_string))
+    channel_ids = [video["video_id"] for video in videos]
+    results["exclude.membership_list"] = measure(
+        lambda: [video_id for video_id in channel_ids if video_id not in exclude_list], 1) / len(channel_ids)
+    exclude_set = set(exclude_list)
+    results["exclude.membership_set"] = measure(
+        lambda: [video_id for video_id in channel_ids if video_id not in exclude_set], arguments.repeat, 10) / len(
+        channel_ids)
+    exclude_filter = ytdl.VideoFilter(exclude_ids=exclude_list)
+    results["exclude.video_filter"] = measure(
+        lambda: [video_id for video_id in channel_ids if not exclude_filter.excludes(video_id)], arguments.repeat,
+        10) / len(channel_ids)
+
+    # Title filter of the main loop and of the channel scan
+    filter_words = ytdl.string_to_list(",".join(generator.sample(TITLE_WORDS, arguments.filter_words)))
+    titles = [video["title"] for video in videos]
+    results["title_filter.any_in_lower"] = measure(
+        lambda: [title for title in titles if any(word.lower() in title.lower() for word in filter_words)],
+        arguments.repeat, 3) / len(titles)
+    video_filter = ytdl.VideoFilter(",".join(filter_words))
+    results["title_filter.video_filter"] = measure(
+        lambda: [title for title in titles if video_filter.title_matches(title)], arguments.repeat, 3) / len(titles)
+
+    youtube_objects = [synthetic_youtube(generator) for _ in range(arguments.resolution_videos)]
+    results["print_resolutions"] = measure(
+        lambda: [ytdl.print_resolutions(youtube_object) for youtube_object in youtube_objects],
+        arguments.repeat, 3) / len(youtube_objects)
+    results["select_streams"] = measure(
+        lambda: [ytdl.select_streams(youtube_object, "1080p") for youtube_object in youtube_objects],
+        arguments.repeat, 3) / len(youtube_objects)
+
+    flat_directory = os.path.join(work_directory, "flat")
+    flat_videos = [dict(video, restricted=False) for video in videos]
+    organize_timings = []
+    for _ in range(arguments.repeat):
+        shutil.rmtree(flat_directory, ignore_errors=True)
+        build_channel_tree(flat_directory, flat_videos, year_subfolders=False)
+        started = time.perf_counter()
+        ytdl.organize_files_by_year(flat_directory)
+        organize_timings.append(time.perf_counter() - started)
+    results["organize_files_by_year"] = min(organize_timings)
+    return results
+
+
+def last_result(results_file: str, parameters: dict) -> dict | None:
+    if not results_file or not os.path.exists(results_file):
+        return None
+    previous = None
+    with open(results_file, "r", encoding="utf-8") as file:
+        for line in file:
+            entry = json.loads(line)
+            if entry["parameters"] == parameters:
+                previous = entry
+    return previous
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="YTDL micro-benchmarks on synthetic archives")
+    parser.add_argument("--files", type=int, default=10000, help="archived videos in the synthetic channel")
+    parser.add_argument("--lookups", type=int, default=50, help="skip checks (half hits, half new videos)")
+    parser.add_argument("--exclude", type=int, default=2000, help="video IDs in the exclude list")
+    parser.add_argument("--filter-words", type=int, default=5, help="title filter words")
+    parser.add_argument("--resolution-videos", type=int, default=200, help="videos for print_resolutions")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions, the best one is reported")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--results", help="JSONL file the results are appended to and compared with")
+    arguments = parser.parse_args()
+    arguments.exclude = min(arguments.exclude, arguments.files)
+    arguments.lookups = max(2, arguments.lookups)
+
+    ytdl = load_ytdl(youtube_watch_url=YOUTUBE_WATCH_URL, output_policy="remux", audio_or_video_bool=False,
+                     stream_codecs=[], avoid_transcode=False)
+    parameters = {name: value for name, value in vars(arguments).items() if name not in ("repeat", "results")}
+    work_directory = tempfile.mkdtemp(prefix="ytdl_micro_")
+    try:
+        # organize_files_by_year prints once per call
+        with open(os.devnull, "w") as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                results = run_benchmarks(ytdl, work_directory, arguments)
+            finally:
+                sys.stdout = stdout
+    finally:
+        shutil.rmtree(work_directory, ignore_errors=True)
+
+    previous = last_result(arguments.results, parameters)
+    regressions = 0
+    print(f"{'benchmark':<45}{'seconds':>14}{'previous':>14}{'change':>10}")
+    for name, seconds in results.items():
+        line = f"{name:<45}{seconds:>14.7f}"
+        if previous and name in previous["results"] and previous["results"][name] > 0:
+            ratio = seconds / previous["results"][name]
+            line += f"{previous['results'][name]:>14.7f}{(ratio - 1) * 100:>+9.1f}%"
+            if ratio > REGRESSION_THRESHOLD:
+                line += "  REGRESSION"
+                regressions += 1
+        print(line)
+    print("(per call for skip_check.find*, exclude.membership_*, exclude.video_filter, title_filter, print_resolutions "
+          "and select_streams)")
+
+    if arguments.results:
+        with open(arguments.results, "a", encoding="utf-8") as file:
+            file.write(json.dumps({"date": datetime.now().isoformat(timespec="seconds"), "parameters": parameters,
+                                   "results": results}) + "\n")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
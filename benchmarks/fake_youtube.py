@@ -0,0 +1,361 @@
+"""Local stand-in for the YouTube endpoints YTDL talks to, used by the benchmarks.
+
+Serves a channel /videos page and a playlist of all its videos (ytInitialData + browse continuations), watch
+pages, innertube player responses and DASH-like audio/video streams generated once with ffmpeg. Run YTDL through
+benchmarks/ytdl_local.py <base url of this server> to send every request here instead of YouTube.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import subprocess
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# resolution -> (itag, width, height, quality)
+# like YouTube, resolutions above 1080p are VP9 WebM only (the generated clip is H.264 either way, ffmpeg probes it)
+VIDEO_FORMATS = {
+    "2160p": (313, 3840, 2160, "hd2160"),
+    "1440p": (271, 2560, 1440, "hd1440"),
+    "1080p": (137, 1920, 1080, "hd1080"),
+    "720p": (136, 1280, 720, "hd720"),
+    "480p": (135, 854, 480, "large"),
+    "360p": (134, 640, 360, "medium")
+}
+PLAYLIST_PAGE_SIZE = 100  # like YouTube
+AUDIO_ITAG = 140
+OPUS_ITAG = 251
+STREAM_HOST = "https://rr1---sn-fake.googlevideo.com"
+VISITOR_DATA = "CgtCZW5jaG1hcmtpbmc%3D"
+
+
+def generate_media(directory: str, duration: int, size: str = "320x180") -> dict:
+    """Creates (once) a video-only MP4, an audio-only M4A and an Opus WebM clip that ffmpeg can mux like real DASH
+    streams."""
+    os.makedirs(directory, exist_ok=True)
+    media = {"video": os.path.join(directory, f"video_{duration}s_{size}.mp4"),
+             "audio": os.path.join(directory, f"audio_{duration}s.m4a"),
+             "opus": os.path.join(directory, f"audio_{duration}s.webm")}
+    if not os.path.exists(media["video"]):
+        subprocess.run(["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-f", "lavfi",
+                        "-i", f"testsrc=size={size}:rate=25", "-t", str(duration), "-c:v", "libx264",
+                        "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-an", media["video"]], check=True)
+    if not os.path.exists(media["audio"]):
+        subprocess.run(["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-f", "lavfi",
+                        "-i", "sine=frequency=440:sample_rate=44100", "-t", str(duration), "-c:a", "aac",
+                        "-b:a", "128k", "-vn", media["audio"]], check=True)
+    if not os.path.exists(media["opus"]):
+        subprocess.run(["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-f", "lavfi",
+                        "-i", "sine=frequency=440:sample_rate=48000", "-t", str(duration), "-c:a", "libopus",
+                        "-b:a", "160k", "-vn", media["opus"]], check=True)
+    return media
+
+
+def make_video_id(channel: str, number: int) -> str:
+    digest = hashlib.sha1(f"{channel}/{number}".encode()).digest()
+    return base64.urlsafe_b64encode(digest).decode()[:11]
+
+
+def format_count(number: int) -> str:
+    for limit, suffix in ((1_000_000, "M"), (1_000, "K")):
+        if number >= limit:
+            return f"{number / limit:.1f}".rstrip("0").rstrip(".") + suffix
+    return str(number)
+
+
+class FakeYouTube:
+    def __init__(self, media_directory: str, videos: int = 50, duration: int = 5, latency_ms: float = 0,
+                 stream_mbit: float = 0, max_resolution: str = "1080p", page_size: int = 30,
+                 channel: str = "BenchChannel"):
+        self.media = generate_media(media_directory, duration)
+        self.media_sizes = {kind: os.path.getsize(path) for kind, path in self.media.items()}
+        self.duration = duration
+        self.latency = latency_ms / 1000
+        self.stream_rate = stream_mbit * 1_000_000 / 8
+        self.resolutions = list(VIDEO_FORMATS)[list(VIDEO_FORMATS).index(max_resolution):]
+        self.page_size = page_size
+        self.channel = channel
+        self.channel_id = "UC" + make_video_id(channel, -1) * 2
+        self.playlist_id = "PL" + make_video_id(channel, -2) * 2
+        self.last_modified = str(int(time.time() * 1_000_000))
+        today = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0)
+        self.videos = [{"video_id": make_video_id(channel, number),
+                        "title": f"Benchmark video {number:05d}",
+                        "views": 1000 + number * 37,
+                        "published": today - timedelta(days=number)}
+                       for number in range(videos)]
+        self.videos_by_id = {video["video_id"]: video for video in self.videos}
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+        self.server = None
+
+    # --- bookkeeping ---------------------------------------------------------------------------------------------
+
+    def count(self, category: str, started: float, byte_count: int) -> None:
+        finished = time.time()
+        with self.stats_lock:
+            stats = self.stats.setdefault(category, {"requests": 0, "bytes": 0, "seconds": 0.0,
+                                                     "first": started, "last": finished})
+            stats["requests"] += 1
+            stats["bytes"] += byte_count
+            stats["seconds"] += finished - started
+            stats["first"] = min(stats["first"], started)
+            stats["last"] = max(stats["last"], finished)
+
+    def snapshot(self) -> dict:
+        with self.stats_lock:
+            return {category: dict(stats) for category, stats in self.stats.items()}
+
+    def reset(self) -> None:
+        with self.stats_lock:
+            self.stats = {}
+
+    # --- responses -----------------------------------------------------------------------------------------------
+
+    def grid_item(self, video: dict) -> dict:
+        """One item of the channel video grid (richItemRenderer/videoRenderer)."""
+        age = (datetime.now(timezone.utc) - video["published"]).days
+        published = f"{age} days ago" if age != 1 else "1 day ago"
+        return {"richItemRenderer": {"content": {"videoRenderer": {
+            "videoId": video["video_id"],
+            "title": {"runs": [{"text": video["title"]}]},
+            "lengthText": {"simpleText": f"{self.duration // 60}:{self.duration % 60:02d}"},
+            "viewCountText": {"simpleText": f"{video['views']:,} views"},
+            "shortViewCountText": {"simpleText": format_count(video["views"]) + " views"},
+            "publishedTimeText": {"simpleText": published}}}}}
+
+    def grid_page(self, page: int) -> list:
+        start = page * self.page_size
+        items = [self.grid_item(video) for video in self.videos[start:start + self.page_size]]
+        if start + self.page_size < len(self.videos):
+            items.append({"continuationItemRenderer": {"continuationEndpoint": {
+                "continuationCommand": {"token": f"page-{page + 1}"}}}})
+        return items
+
+    def channel_page(self) -> str:
+        initial_data = {
+            "responseContext": {"webResponseContextExtensionData": {"ytConfigData": {"visitorData": VISITOR_DATA}}},
+            "metadata": {"channelMetadataRenderer": {"title": self.channel, "externalId": self.channel_id,
+                                                     "vanityChannelUrl": f"http://www.youtube.com/@{self.channel}"}},
+            "contents": {"twoColumnBrowseResultsRenderer": {"tabs": [{"tabRenderer": {
+                "endpoint": {"commandMetadata": {"webCommandMetadata": {"url": f"/@{self.channel}/videos"}}},
+                "selected": True,
+                "content": {"richGridRenderer": {"contents": self.grid_page(0)}}}}]}}
+        }
+        return f"<html><body><script>var ytInitialData = {json.dumps(initial_data)};</script></body></html>"
+
+    def playlist_item(self, video: dict) -> dict:
+        age = (datetime.now(timezone.utc) - video["published"]).days
+        published = f"{age} days ago" if age != 1 else "1 day ago"
+        return {"playlistVideoRenderer": {
+            "videoId": video["video_id"],
+            "title": {"runs": [{"text": video["title"]}]},
+            "lengthText": {"simpleText": f"{self.duration // 60}:{self.duration % 60:02d}"},
+            "lengthSeconds": str(self.duration),
+            "videoInfo": {"runs": [{"text": format_count(video["views"]) + " views"}, {"text": " • "},
+                                   {"text": published}]},
+            "isPlayable": True}}
+
+    def playlist_items(self, page: int) -> list:
+        """The playlist holds the channel videos oldest first, new uploads are appended at the end."""
+        videos = self.videos[::-1]
+        start = page * PLAYLIST_PAGE_SIZE
+        items = [self.playlist_item(video) for video in videos[start:start + PLAYLIST_PAGE_SIZE]]
+        if start + PLAYLIST_PAGE_SIZE < len(videos):
+            items.append({"continuationItemRenderer": {"continuationEndpoint": {
+                "continuationCommand": {"token": f"playlist-{page + 1}"}}}})
+        return items
+
+    def playlist_page(self) -> str:
+        updated = max(video["published"] for video in self.videos) if self.videos else datetime.now(timezone.utc)
+        initial_data = {
+            "responseContext": {"webResponseContextExtensionData": {"ytConfigData": {"visitorData": VISITOR_DATA}}},
+            "contents": {"twoColumnBrowseResultsRenderer": {"tabs": [{"tabRenderer": {"selected": True, "content": {
+                "sectionListRenderer": {"contents": [{"itemSectionRenderer": {"contents": [{
+                    "playlistVideoListRenderer": {"contents": self.playlist_items(0)}}]}}]}}}}]}},
+            "sidebar": {"playlistSidebarRenderer": {"items": [
+                {"playlistSidebarPrimaryInfoRenderer": {
+                    "title": {"runs": [{"text": f"{self.channel} uploads"}]},
+                    "stats": [{"runs": [{"text": str(len(self.videos))}, {"text": " videos"}]},
+                              {"simpleText": "1,234 views"},
+                              {"runs": [{"text": "Last updated on "},
+                                        {"text": f"{updated:%b} {updated.day}, {updated.year}"}]}]}},
+                {"playlistSidebarSecondaryInfoRenderer": {"videoOwner": {"videoOwnerRenderer": {"title": {"runs": [
+                    {"text": self.channel,
+                     "navigationEndpoint": {"browseEndpoint": {"browseId": self.channel_id}}}]}}}}}]}}
+        }
+        return f"<html><body><script>var ytInitialData = {json.dumps(initial_data)};</script></body></html>"
+
+    def watch_page(self, video: dict) -> str:
+        published = video["published"].isoformat(timespec="seconds")
+        return (f'<html><head><meta itemprop="datePublished" content="{published}">'
+                f'</head><body><script>var ytInitialData = {{"responseContext": {{}}}};</script></body></html>')
+
+    def stream_format(self, video: dict, kind: str, itag: int) -> dict:
+        size = self.media_sizes[kind]
+        url = (f"{STREAM_HOST}/videoplayback?expire={int(time.time()) + 21600}&id={video['video_id']}"
+               f"&itag={itag}&kind={kind}&lmt={self.last_modified}&clen={size}")
+        stream = {"itag": itag, "url": url, "contentLength": str(size), "lastModified": self.last_modified,
+                  "approxDurationMs": str(self.duration * 1000), "bitrate": size * 8 // self.duration}
+        if kind == "audio":
+            stream.update({"mimeType": 'audio/mp4; codecs="mp4a.40.2"', "averageBitrate": 128000,
+                           "audioQuality": "AUDIO_QUALITY_MEDIUM", "audioSampleRate": "44100", "audioChannels": 2})
+        elif kind == "opus":
+            stream.update({"mimeType": 'audio/webm; codecs="opus"', "averageBitrate": 160000,
+                           "audioQuality": "AUDIO_QUALITY_MEDIUM", "audioSampleRate": "48000", "audioChannels": 2})
+        return stream
+
+    def player_response(self, video_id: str) -> dict:
+        video = self.videos_by_id.get(video_id)
+        if video is None:
+            return {"responseContext": {"visitorData": VISITOR_DATA},
+                    "playabilityStatus": {"status": "ERROR", "reason": "Video unavailable"}}
+        adaptive_formats = []
+        for resolution in self.resolutions:
+            itag, width, height, quality = VIDEO_FORMATS[resolution]
+            stream = self.stream_format(video, "video", itag)
+            mime_type = 'video/webm; codecs="vp9"' if height > 1080 else 'video/mp4; codecs="avc1.640028"'
+            stream.update({"mimeType": mime_type, "width": width, "height": height,
+                           "quality": quality, "qualityLabel": resolution, "fps": 25})
+            adaptive_formats.append(stream)
+        adaptive_formats.append(self.stream_format(video, "audio", AUDIO_ITAG))
+        adaptive_formats.append(self.stream_format(video, "opus", OPUS_ITAG))
+        return {
+            "responseContext": {"visitorData": VISITOR_DATA},
+            "playabilityStatus": {"status": "OK"},
+            "videoDetails": {"videoId": video_id, "title": video["title"], "lengthSeconds": str(self.duration),
+                             "channelId": self.channel_id, "author": self.channel,
+                             "viewCount": str(video["views"]), "isLiveContent": False},
+            "streamingData": {"expiresInSeconds": "21540", "adaptiveFormats": adaptive_formats},
+            "playerConfig": {"mediaCommonConfig": {"mediaUstreamerRequestConfig": {
+                "videoPlaybackUstreamerConfig": ""}}}
+        }
+
+    # --- server --------------------------------------------------------------------------------------------------
+
+    def handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def reply(self, category: str, started: float, body: bytes, content_type: str, status: int = 200,
+                      headers: dict | None = None) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if self.command != "HEAD":
+                    fake.write_throttled(self.wfile, body)
+                fake.count(category, started, len(body))
+
+            def do_HEAD(self) -> None:
+                self.do_GET()
+
+            def do_GET(self) -> None:
+                started = time.time()
+                time.sleep(fake.latency)
+                parts = urlsplit(self.path)
+                query = parse_qs(parts.query)
+                if parts.path == "/videoplayback":
+                    media_file = fake.media[query["kind"][0]]
+                    size = fake.media_sizes[query["kind"][0]]
+                    byte_range = query.get("range", [f"0-{size - 1}"])[0]
+                    start, end = (int(value) for value in byte_range.split("-"))
+                    end = min(end, size - 1)
+                    with open(media_file, "rb") as file:
+                        file.seek(start)
+                        body = file.read(end - start + 1)
+                    self.reply("stream", started, body, "application/octet-stream")
+                elif parts.path == "/watch" and query.get("v", [""])[0] in fake.videos_by_id:
+                    self.reply("watch", started, fake.watch_page(fake.videos_by_id[query["v"][0]]).encode(),
+                               "text/html; charset=utf-8")
+                elif parts.path == "/playlist" and query.get("list", [""])[0] == fake.playlist_id:
+                    self.reply("listing", started, fake.playlist_page().encode(), "text/html; charset=utf-8")
+                elif parts.path.startswith(("/@", "/channel/", "/c/", "/user/")):
+                    self.reply("listing", started, fake.channel_page().encode(), "text/html; charset=utf-8")
+                else:
+                    self.reply("other", started, b"Not Found", "text/plain", 404)
+
+            def do_POST(self) -> None:
+                started = time.time()
+                time.sleep(fake.latency)
+                data = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                path = urlsplit(self.path).path
+                if path == "/youtubei/v1/player":
+                    body = fake.player_response(data.get("videoId", ""))
+                    self.reply("player", started, json.dumps(body).encode(), "application/json")
+                elif path == "/youtubei/v1/browse" and data.get("continuation", "").startswith("page-"):
+                    page = int(data["continuation"].split("-")[1])
+                    body = {"onResponseReceivedActions": [{"appendContinuationItemsAction": {
+                        "continuationItems": fake.grid_page(page)}}]}
+                    self.reply("listing", started, json.dumps(body).encode(), "application/json")
+                elif path == "/youtubei/v1/browse" and data.get("continuation", "").startswith("playlist-"):
+                    page = int(data["continuation"].split("-")[1])
+                    body = {"onResponseReceivedActions": [{"appendContinuationItemsAction": {
+                        "continuationItems": fake.playlist_items(page)}}]}
+                    self.reply("listing", started, json.dumps(body).encode(), "application/json")
+                else:
+                    self.reply("other", started, b"{}", "application/json", 404)
+
+        return Handler
+
+    def write_throttled(self, output, body: bytes) -> None:
+        if not self.stream_rate:
+            output.write(body)
+            return
+        for offset in range(0, len(body), 65536):
+            block = body[offset:offset + 65536]
+            output.write(block)
+            time.sleep(len(block) / self.stream_rate)
+
+    def start(self, port: int = 0) -> str:
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self.handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    @property
+    def channel_url(self) -> str:
+        return f"https://www.youtube.com/@{self.channel}"
+
+    @property
+    def playlist_url(self) -> str:
+        return f"https://www.youtube.com/playlist?list={self.playlist_id}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake YouTube channel for YTDL benchmarks")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--videos", type=int, default=50)
+    parser.add_argument("--duration", type=int, default=5, help="clip length in seconds")
+    parser.add_argument("--latency-ms", type=float, default=0, help="added to every response")
+    parser.add_argument("--stream-mbit", type=float, default=0, help="per connection, 0 = unlimited")
+    parser.add_argument("--max-resolution", default="1080p", choices=list(VIDEO_FORMATS))
+    parser.add_argument("--media-directory", default=os.path.join(os.path.dirname(__file__), ".media"))
+    arguments = parser.parse_args()
+    fake_youtube = FakeYouTube(arguments.media_directory, arguments.videos, arguments.duration, arguments.latency_ms,
+                               arguments.stream_mbit, arguments.max_resolution)
+    base_url = fake_youtube.start(arguments.port)
+    print(f"Fake YouTube on {base_url}, channel {fake_youtube.channel_url}, playlist {fake_youtube.playlist_url}")
+    print(f"Run YTDL with: python {os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ytdl_local.py')} "
+          f"{base_url} --sync")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake_youtube.stop()
@@ -0,0 +1,37 @@
+"""Loads the functions of YTDL.py for benchmarks without starting its interactive main loop."""
+import ast
+import os
+import types
+
+YTDL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "YTDL.py")
+
+
+def split_ytdl() -> tuple[list, list]:
+    """The statements of YTDL.py before its main program (imports, constants, classes, functions) and the main
+    program itself, which starts with the command line parsing."""
+    with open(YTDL_PATH, "r", encoding="utf-8") as file:
+        tree = ast.parse(file.read(), YTDL_PATH)
+    for position, node in enumerate(tree.body):
+        if (isinstance(node, ast.Assign) and isinstance(node.value, ast.Call)
+                and getattr(node.value.func, "id", None) == "parse_arguments"):
+            return tree.body[:position], tree.body[position:]
+    return tree.body, []
+
+
+def load_ytdl(**module_globals) -> types.ModuleType:
+    """Executes the imports, constants, classes and functions of YTDL.py, everything before the main loop.
+
+    module_globals stand in for the values the main loop normally reads from config.json (youtube_watch_url, ...).
+    """
+    body, _ = split_ytdl()
+    module = types.ModuleType("YTDL")
+    module.__file__ = YTDL_PATH
+    exec(compile(ast.Module(body=body, type_ignores=[]), YTDL_PATH, "exec"), module.__dict__)
+    module.__dict__.update(module_globals)
+    return module
+
+
+def run_ytdl_main(module: types.ModuleType) -> None:
+    """Runs the main program of YTDL.py on a module from load_ytdl(), with whatever the caller patched into it."""
+    _, main_program = split_ytdl()
+    exec(compile(ast.Module(body=main_program, type_ignores=[]), YTDL_PATH, "exec"), module.__dict__)
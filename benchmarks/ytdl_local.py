@@ -0,0 +1,36 @@
+"""Runs YTDL.py with every HTTP request sent to a local server instead of YouTube, e.g. benchmarks/fake_youtube.py.
+
+    python benchmarks/ytdl_local.py http://127.0.0.1:8765 --sync
+
+The scheme and host of each request URL are replaced by the base URL, path and query stay. The redirect lives only
+in this harness, YTDL.py itself always talks to the hosts it was given.
+"""
+import sys
+import urllib.parse
+
+import pytubefix.request
+
+from ytdl_loader import YTDL_PATH, load_ytdl, run_ytdl_main
+
+
+def main() -> None:
+    if len(sys.argv) < 2 or not sys.argv[1].startswith(("http://", "https://")):
+        print("usage: ytdl_local.py BASE_URL [YTDL arguments...]")
+        sys.exit(2)
+    base_url = urllib.parse.urlsplit(sys.argv[1])
+    sys.argv = [YTDL_PATH] + sys.argv[2:]
+    ytdl = load_ytdl()
+    http_pool_request = ytdl.http_pool_request
+
+    def local_request(url: str, *args, **kwargs):
+        return http_pool_request(urllib.parse.urlunsplit(base_url[:2] + urllib.parse.urlsplit(url)[2:]),
+                                 *args, **kwargs)
+
+    # YTDL's functions look the name up in its module globals, pytubefix goes through http_pool_execute_request
+    ytdl.http_pool_request = local_request
+    pytubefix.request._execute_request = ytdl.http_pool_execute_request
+    run_ytdl_main(ytdl)
+
+
+if __name__ == "__main__":
+    main()